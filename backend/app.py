@@ -1,67 +1,51 @@
 from flask import Flask, request, jsonify, send_from_directory
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
-from datetime import datetime, timedelta
+from datetime import datetime, date, timedelta, MINYEAR, MAXYEAR
+from collections import defaultdict
 import os
-from models import db, Booking, TimeSlot, Pricing, Payment
+import sqlite3
+from models import db, Booking, TimeSlot, Pricing, Payment, DayAvailability
+from sqlalchemy import tuple_, func, event, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import joinedload
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from dotenv import load_dotenv
-import traceback
 from flask_mail import Mail, Message
 import uuid
+import time
+import orjson
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import logging
-from werkzeug.serving import WSGIRequestHandler
-
-# Set up logging
-logging.basicConfig(level=logging.DEBUG)
-logger = logging.getLogger('werkzeug')
-logger.setLevel(logging.INFO)
-
-# Custom log handler to prevent formatting errors
-class SafeLogHandler(logging.Handler):
-    def emit(self, record):
-        try:
-            msg = self.format(record)
-            print(msg)
-        except Exception:
-            pass
-
-# Create and add the safe log handler
-safe_handler = SafeLogHandler()
-logger.addHandler(safe_handler)
-logger.propagate = False
-
-# Disable Werkzeug's default logging
-import logging
-logging.getLogger('werkzeug').disabled = True
-
-# Custom log method for WSGIRequestHandler
-def safe_log_request(self, format, *args):
-    try:
-        if format == 'info':
-            # Special case for request logging
-            msg, code, size = args
-            print(f'Request: {msg}, Status: {code}, Size: {size}')
-        else:
-            print(format % args if args else format)
-    except Exception:
-        pass
-
-# Patch WSGIRequestHandler
-from werkzeug.serving import WSGIRequestHandler
-WSGIRequestHandler.log = safe_log_request
+import queue
+import atexit
+from logging.handlers import QueueHandler, QueueListener
 
 # Load environment variables
 load_dotenv()
 
+# Set up logging; records are queued and written by a listener thread so request threads never block on I/O
+log_queue = queue.Queue(-1)
+logging.basicConfig(
+    level=os.getenv('LOG_LEVEL', 'WARNING').upper(),
+    handlers=[QueueHandler(log_queue)]
+)
+log_listener = QueueListener(log_queue, logging.StreamHandler())
+log_listener.start()
+atexit.register(log_listener.stop)
+logger = logging.getLogger('backend')
+
 # Get absolute paths
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 INSTANCE_PATH = os.path.join(BASE_DIR, 'instance')
 DB_PATH = os.path.join(INSTANCE_PATH, 'chatbot.db')
 
-print("=== Server Starting ===")
-print(f"Base Directory: {BASE_DIR}")
-print(f"Instance Path: {INSTANCE_PATH}")
-print(f"Database Path: {DB_PATH}")
+logger.info("=== Server Starting ===")
+logger.info("Base Directory: %s", BASE_DIR)
+logger.info("Instance Path: %s", INSTANCE_PATH)
+logger.info("Database Path: %s", DB_PATH)
 
 app = Flask(__name__, 
            static_folder='../frontend/static',
@@ -81,26 +65,61 @@ CORS(app, resources={
 # Configure Flask-SQLAlchemy with absolute path
 app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{DB_PATH}'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'pool_pre_ping': True,
+    'pool_size': 10,
+    'max_overflow': 20,
+    'connect_args': {'check_same_thread': False}
+}
+
+class OrjsonProvider(JSONProvider):
+    """JSON provider backed by orjson, which encodes and decodes much faster than the stdlib."""
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj), mimetype='application/json')
+
+app.json = OrjsonProvider(app)
 
 # Initialize extensions
 db.init_app(app)
+
+@event.listens_for(Engine, 'connect')
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers proceed during a write; NORMAL sync is safe under WAL and avoids an fsync per commit
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    # busy_timeout first: switching to WAL needs a lock and would fail immediately if another connection holds it
+    cursor.execute('PRAGMA busy_timeout=5000')
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute('PRAGMA cache_size=-65536')
+    cursor.execute('PRAGMA temp_store=MEMORY')
+    cursor.execute('PRAGMA foreign_keys=ON')
+    cursor.close()
 jwt = JWTManager(app)
 mail = Mail(app)
 
 @app.before_request
 def log_request_info():
-    logger.info('Headers: %s', dict(request.headers))
-    logger.info('Body: %s', request.get_data())
+    # Only log in debug mode, and never read the body here; that would buffer every upload
+    if app.debug:
+        logger.debug('Headers: %s', request.headers)
+        if request.method in ('POST', 'PUT', 'PATCH'):
+            logger.debug('Body length: %d', request.content_length or 0)
 
 @app.route('/api/bookings/create', methods=['POST'])
 def create_booking():
     logger.info('=== Starting Booking Creation ===')
     
     try:
-        # Get and log the raw data first
-        raw_data = request.get_data()
-        logger.info('Raw request data: %s', raw_data)
-        
         # Try to parse JSON
         data = request.json
         logger.info('Parsed JSON data: %s', data)
@@ -154,19 +173,13 @@ def create_booking():
             return jsonify({'error': 'Invalid visitor numbers'}), 400
 
         try:
-            booking_date = datetime.strptime(data['date'], '%Y-%m-%d').date()
+            booking_date = date.fromisoformat(data['date'])
         except ValueError:
             return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
             
         # Get pricing information
         try:
-            pricing = Pricing.query.filter_by(
-                nationality=data['nationality'],
-                ticket_type=data['ticketType']
-            ).filter(
-                Pricing.effective_from <= booking_date,
-                Pricing.effective_to >= booking_date
-            ).first()
+            pricing = get_pricing_cached(data['nationality'], data['ticketType'], booking_date)
             
             if not pricing:
                 return jsonify({'error': 'No valid pricing found for the selected options'}), 400
@@ -181,15 +194,12 @@ def create_booking():
 
         # Get or create time slot with transaction
         try:
-            # Start transaction
-            db.session.begin_nested()
-            
-            # Get the time slot with row-level locking
+            # Get the time slot
             time_slot = TimeSlot.query.filter_by(
                 date=booking_date,
                 slot_time=data['timeSlot'],
                 ticket_type=data['ticketType']
-            ).with_for_update().first()
+            ).first()
 
             if not time_slot:
                 time_slot = TimeSlot(
@@ -205,13 +215,15 @@ def create_booking():
             logger.info('Time slot found/created - Current capacity: %d, Booked: %d', 
                        time_slot.capacity, time_slot.booked_count)
             
-            if time_slot.booked_count + total_visitors > time_slot.capacity:
+            # Check and claim capacity in one statement so concurrent bookings can't both pass
+            if not reserve_capacity(time_slot.id, total_visitors):
+                available = time_slot.capacity - time_slot.booked_count
                 db.session.rollback()
                 return jsonify({
-                    'error': f'Not enough capacity available. Requested: {total_visitors}, Available: {time_slot.capacity - time_slot.booked_count}'
+                    'error': f'Not enough capacity available. Requested: {total_visitors}, Available: {available}'
                 }), 400
 
-            time_slot.booked_count += total_visitors
+            refresh_day_availability(booking_date)
             
             # Create the booking
             booking = Booking(
@@ -229,6 +241,7 @@ def create_booking():
             
             db.session.add(booking)
             db.session.commit()
+            invalidate_calendar_cache(booking_date)
             
             logger.info('Booking created successfully - ID: %s', booking.booking_id)
             
@@ -246,15 +259,13 @@ def create_booking():
                 'ticketType': data['ticketType']
             })
             
-        except Exception as e:
+        except Exception:
             db.session.rollback()
-            logger.error('Error in booking transaction: %s', str(e))
-            logger.error('Traceback: %s', traceback.format_exc())
+            logger.exception('Error in booking transaction')
             return jsonify({'error': 'Failed to process booking'}), 500
             
     except Exception as e:
-        logger.error('Error in create_booking: %s', str(e))
-        logger.error('Traceback: %s', traceback.format_exc())
+        logger.exception('Error in create_booking')
         return jsonify({'error': str(e)}), 500
 
 # Configuration from environment
@@ -268,80 +279,232 @@ app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME')
 app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD')
 app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_DEFAULT_SENDER')
 
+# In-process pricing cache; pricing rows change rarely, so avoid a query per request
+_PRICING_CACHE = {}
+_PRICING_CACHE_TS = 0
+_PRICING_TTL = 300  # seconds
+
+def invalidate_pricing_cache():
+    global _PRICING_CACHE_TS
+    _PRICING_CACHE_TS = 0
+
+def get_pricing_cached(nationality, ticket_type, date_obj, fallback_to_latest=False):
+    """Return the pricing row whose effective window contains date_obj, or None.
+    
+    With fallback_to_latest, a date outside every window gets the most recent row instead, so
+    bookings made before init_db last reset effective_from still show a price.
+    """
+    global _PRICING_CACHE, _PRICING_CACHE_TS
+    if time.time() - _PRICING_CACHE_TS > _PRICING_TTL:
+        cache = defaultdict(list)
+        for row in db.session.query(
+            Pricing.nationality,
+            Pricing.ticket_type,
+            Pricing.adult_price,
+            Pricing.child_price,
+            Pricing.effective_from,
+            Pricing.effective_to
+        ).all():
+            cache[(row.nationality, row.ticket_type)].append(row)
+        _PRICING_CACHE = dict(cache)
+        _PRICING_CACHE_TS = time.time()
+    
+    rows = _PRICING_CACHE.get((nationality, ticket_type), ())
+    for row in rows:
+        if row.effective_from <= date_obj <= row.effective_to:
+            return row
+    if fallback_to_latest and rows:
+        return max(rows, key=lambda row: row.effective_from)
+    return None
+
+# In-process calendar cache keyed by (year, month); entries are dropped when a booking changes the month
+_CALENDAR_CACHE = {}
+_CALENDAR_TTL = 60  # seconds; bounds staleness across workers, which invalidate independently
+_CALENDAR_CACHE_SIZE = 256
+
+def invalidate_calendar_cache(date_obj=None):
+    if date_obj is None:
+        _CALENDAR_CACHE.clear()
+    else:
+        _CALENDAR_CACHE.pop((date_obj.year, date_obj.month), None)
+
+def store_calendar(key, entry):
+    """Cache a month, evicting the least recently built one when full instead of dropping them all."""
+    _CALENDAR_CACHE.pop(key, None)
+    while len(_CALENDAR_CACHE) >= _CALENDAR_CACHE_SIZE:
+        _CALENDAR_CACHE.pop(next(iter(_CALENDAR_CACHE)), None)
+    _CALENDAR_CACHE[key] = entry
+
+def reserve_capacity(time_slot_id, count):
+    """Atomically add count to a slot's booked_count if it fits; returns False when it doesn't."""
+    result = db.session.execute(
+        update(TimeSlot)
+        .where(
+            TimeSlot.id == time_slot_id,
+            TimeSlot.booked_count + count <= TimeSlot.capacity
+        )
+        .values(booked_count=TimeSlot.booked_count + count)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+def refresh_day_availability(date_obj):
+    """Recompute the materialized availability row for a date within the current transaction."""
+    total_capacity, total_available = db.session.query(
+        func.coalesce(func.sum(TimeSlot.capacity), 0),
+        func.coalesce(func.sum(TimeSlot.capacity - TimeSlot.booked_count), 0)
+    ).filter(TimeSlot.date == date_obj).one()
+    db.session.merge(DayAvailability(
+        date=date_obj,
+        total_capacity=total_capacity,
+        total_available=total_available,
+        status=DayAvailability.status_for(total_capacity, total_available)
+    ))
+
+DEFAULT_SLOT_TIMES = ('10:00 AM', '2:00 PM')
+DEFAULT_SLOT_CAPACITY = 50
+SLOT_HORIZON_DAYS = 400
+
+def ensure_future_slots(days=SLOT_HORIZON_DAYS):
+    """Create the default time slots for the coming days in one transaction, skipping existing ones."""
+    today = datetime.now().date()
+    rows = [{
+        'date': today + timedelta(days=offset),
+        'slot_time': slot_time,
+        'capacity': DEFAULT_SLOT_CAPACITY,
+        'ticket_type': 'Regular',
+        'booked_count': 0
+    } for offset in range(days) for slot_time in DEFAULT_SLOT_TIMES]
+    
+    try:
+        db.session.execute(sqlite_insert(TimeSlot).on_conflict_do_nothing(), rows)
+        db.session.commit()
+        invalidate_calendar_cache()
+        logger.info("Ensured default time slots through %s", today + timedelta(days=days - 1))
+    except Exception:
+        db.session.rollback()
+        logger.exception("Error creating future time slots")
+
+def schedule_slot_refresh(interval=24 * 60 * 60, lock_path=None):
+    """Keep the precreated slot window rolling forward once a day.
+    
+    With lock_path, only the process holding an exclusive lock on that file refreshes, so
+    gunicorn workers don't all run the same job; if the holder exits another one takes over.
+    """
+    lock_file = open(lock_path, 'a') if lock_path else None
+    
+    def holds_lock():
+        if lock_file is None:
+            return True
+        import fcntl  # Unix-only, like gunicorn; the dev server runs without a lock
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+    
+    def run():
+        while True:
+            time.sleep(interval)
+            if holds_lock():
+                with app.app_context():
+                    ensure_future_slots()
+    threading.Thread(target=run, name='slot-refresh', daemon=True).start()
+
 def init_db():
     with app.app_context():
         try:
             # Create all tables
             db.create_all()
-            print("Database tables created successfully")
+            logger.info("Database tables created successfully")
             
-            # Clear existing pricing data
-            try:
-                Pricing.query.delete()
-                db.session.commit()
-                print("Cleared existing pricing data")
-            except Exception as e:
-                print(f"Error clearing pricing data: {str(e)}")
-                db.session.rollback()
+            # create_all skips existing tables, so add any indexes they are missing
+            for table in (Pricing.__table__, Payment.__table__):
+                for index in table.indexes:
+                    index.create(bind=db.engine, checkfirst=True)
             
-            # Add default pricing
+            # Replace pricing with the defaults in a single transaction
             today = datetime.now().date()
             future_date = today + timedelta(days=365)
             
             default_pricing = [
-                Pricing(
-                    nationality='Local',
-                    ticket_type='Regular',
-                    adult_price=20.0,
-                    child_price=10.0,
-                    effective_from=today,
-                    effective_to=future_date
-                ),
-                Pricing(
-                    nationality='Foreign',
-                    ticket_type='Regular',
-                    adult_price=30.0,
-                    child_price=15.0,
-                    effective_from=today,
-                    effective_to=future_date
-                )
+                {
+                    'nationality': 'Local',
+                    'ticket_type': 'Regular',
+                    'adult_price': 20.0,
+                    'child_price': 10.0,
+                    'effective_from': today,
+                    'effective_to': future_date
+                },
+                {
+                    'nationality': 'Foreign',
+                    'ticket_type': 'Regular',
+                    'adult_price': 30.0,
+                    'child_price': 15.0,
+                    'effective_from': today,
+                    'effective_to': future_date
+                }
             ]
             
-            for pricing in default_pricing:
-                try:
-                    db.session.add(pricing)
-                    db.session.commit()
-                    print(f"Added pricing for {pricing.nationality} - {pricing.ticket_type}")
-                except Exception as e:
-                    print(f"Error adding pricing: {str(e)}")
-                    db.session.rollback()
+            try:
+                Pricing.query.delete()
+                db.session.bulk_insert_mappings(Pricing, default_pricing)
+                db.session.commit()
+                logger.info("Reset pricing to %d default records", len(default_pricing))
+            except Exception:
+                logger.exception("Error resetting pricing data")
+                db.session.rollback()
+            
+            invalidate_pricing_cache()
+            
+            # Precreate time slots so read endpoints never have to write
+            ensure_future_slots()
             
             # Verify pricing data
             all_pricing = Pricing.query.all()
-            print(f"Total pricing records: {len(all_pricing)}")
+            logger.info("Total pricing records: %d", len(all_pricing))
             for p in all_pricing:
-                print(f"Pricing: {p.nationality} - {p.ticket_type}: Adult=${p.adult_price}, Child=${p.child_price}")
+                logger.info("Pricing: %s - %s: Adult=$%s, Child=$%s", p.nationality, p.ticket_type, p.adult_price, p.child_price)
                 
-        except Exception as e:
-            print(f"Error initializing database: {str(e)}")
-            traceback.print_exc()
+        except Exception:
+            logger.exception("Error initializing database")
             raise
 
 def send_booking_confirmation(booking):
     # Email sending is now handled by the gateway
     return True
 
+# Confirmation emails are sent off the request thread so payments don't wait on SMTP
+mail_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='mail')
+
+def send_booking_confirmation_async(booking_id):
+    with app.app_context():
+        try:
+            booking = Booking.query.filter_by(booking_id=booking_id).first()
+            if not booking:
+                logger.warning('Booking %s not found for confirmation email', booking_id)
+                return
+            if not send_booking_confirmation(booking):
+                logger.warning('Failed to send confirmation email for booking %s', booking_id)
+        except Exception:
+            logger.exception('Error sending confirmation email for booking %s', booking_id)
+
 # Serve main HTML file
 @app.route('/')
 def serve_index():
     return send_from_directory('../frontend', 'index.html')
 
 # Booking endpoints
-@app.route('/api/bookings/availability/<date>', methods=['GET'])
-def check_availability(date):
+@app.route('/api/bookings/availability/<date_str>', methods=['GET'])
+def check_availability(date_str):
     try:
-        date_obj = datetime.strptime(date, '%Y-%m-%d').date()
-        slots = TimeSlot.query.filter_by(date=date_obj).all()
+        date_obj = date.fromisoformat(date_str)
+        slots = db.session.query(
+            TimeSlot.slot_time,
+            TimeSlot.capacity,
+            TimeSlot.booked_count,
+            TimeSlot.ticket_type
+        ).filter_by(date=date_obj).all()
         return jsonify([{
             'time': slot.slot_time,
             'available': slot.capacity - slot.booked_count,
@@ -352,49 +515,27 @@ def check_availability(date):
 
 @app.route('/api/bookings', methods=['GET'])
 def get_bookings():
+    # Without a date filter, list all bookings
+    date_str = request.args.get('date')
+    if not date_str:
+        return list_bookings()
+    
     try:
-        date_str = request.args.get('date')
-        if not date_str:
-            return jsonify({'error': 'Date parameter is required'}), 400
-            
         try:
-            date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
+            date_obj = date.fromisoformat(date_str)
         except ValueError:
             return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
             
         # Get time slots for the date
-        slots = TimeSlot.query.filter_by(date=date_obj).all()
+        slots = db.session.query(
+            TimeSlot.slot_time,
+            TimeSlot.capacity,
+            TimeSlot.booked_count,
+            TimeSlot.ticket_type
+        ).filter_by(date=date_obj).all()
         
-        # If no slots exist for this date, create them
-        if not slots:
-            morning_slot = TimeSlot(
-                date=date_obj,
-                slot_time='10:00 AM',
-                capacity=50,  # Back to 50 slots
-                ticket_type='Regular',
-                booked_count=0
-            )
-            afternoon_slot = TimeSlot(
-                date=date_obj,
-                slot_time='2:00 PM',
-                capacity=50,  # Back to 50 slots
-                ticket_type='Regular',
-                booked_count=0
-            )
-            
-            try:
-                db.session.add(morning_slot)
-                db.session.add(afternoon_slot)
-                db.session.commit()
-                print(f"Successfully created time slots for {date_obj}")  # Add debug logging
-                slots = [morning_slot, afternoon_slot]
-            except Exception as e:
-                db.session.rollback()
-                print(f"Error creating time slots: {str(e)}")
-                return jsonify({'error': 'Failed to create time slots'}), 500
-        
-        # Get bookings for the date
-        bookings = Booking.query.filter_by(date=date_obj).all()
+        # Get bookings for the date, loading their payments in the same query
+        bookings = Booking.query.options(joinedload(Booking.payment)).filter_by(date=date_obj).all()
         
         return jsonify({
             'slots': [{
@@ -407,8 +548,8 @@ def get_bookings():
             'bookings': [booking.to_dict() for booking in bookings]
         })
         
-    except Exception as e:
-        print(f"Error in get_bookings: {str(e)}")
+    except Exception:
+        logger.exception("Error in get_bookings")
         return jsonify({'error': 'Internal server error'}), 500
 
 @app.route('/api/bookings/<booking_id>', methods=['GET'])
@@ -440,26 +581,33 @@ def get_booking(booking_id):
             'message': str(e)
         }), 400
 
-@app.route('/api/bookings', methods=['GET'])
-def get_user_bookings():
+def list_bookings():
+    """List every booking with its slot, payment and pricing details."""
     try:
         # Get all bookings ordered by date
         bookings = Booking.query.order_by(Booking.date.desc()).all()
         
+        # Batch-load associated time slots and payments instead of querying per booking
+        slot_keys = {(b.date, b.time_slot, b.ticket_type) for b in bookings}
+        booking_ids = {b.booking_id for b in bookings}
+        
+        time_slots = {}
+        payments = {}
+        if bookings:
+            for slot in TimeSlot.query.filter(
+                tuple_(TimeSlot.date, TimeSlot.slot_time, TimeSlot.ticket_type).in_(slot_keys)
+            ).all():
+                time_slots[(slot.date, slot.slot_time, slot.ticket_type)] = slot
+            for payment in Payment.query.filter(Payment.booking_id.in_(booking_ids)).all():
+                payments.setdefault(payment.booking_id, payment)
+        
         bookings_data = []
         for booking in bookings:
             try:
-                # Get associated time slot
-                time_slot = TimeSlot.query.get(booking.time_slot_id)
-                
-                # Get associated payment
-                payment = Payment.query.filter_by(booking_id=booking.id).first()
-                
-                # Get pricing info
-                pricing = Pricing.query.filter_by(
-                    nationality=booking.nationality,
-                    ticket_type=booking.ticket_type
-                ).first()
+                time_slot = time_slots.get((booking.date, booking.time_slot, booking.ticket_type))
+                payment = payments.get(booking.booking_id)
+                pricing = get_pricing_cached(booking.nationality, booking.ticket_type, booking.date,
+                                             fallback_to_latest=True)
                 
                 # Calculate total amount
                 adult_total = booking.adults * (pricing.adult_price if pricing else 0)
@@ -474,10 +622,10 @@ def get_user_bookings():
                     'adults': booking.adults,
                     'children': booking.children,
                     'ticket_type': booking.ticket_type,
-                    'time_slot': f"{time_slot.start_time.strftime('%I:%M %p')} - {time_slot.end_time.strftime('%I:%M %p')}" if time_slot else 'N/A',
+                    'time_slot': time_slot.slot_time if time_slot else 'N/A',
                     'status': booking.status,
                     'payment_status': payment.status if payment else 'Not Initiated',
-                    'payment_id': payment.payment_id if payment else None,
+                    'payment_id': payment.id if payment else None,
                     'total_amount': f"${total_amount:.2f}",
                     'pricing_details': {
                         'adult_price': f"${pricing.adult_price:.2f}" if pricing else 'N/A',
@@ -487,74 +635,15 @@ def get_user_bookings():
                     }
                 }
                 bookings_data.append(booking_info)
-            except Exception as e:
-                print(f"Error processing booking {booking.id}: {str(e)}")
+            except Exception:
+                logger.exception("Error processing booking %s", booking.id)
                 continue
         
         return jsonify({'success': True, 'bookings': bookings_data})
-    except Exception as e:
-        print(f"Error fetching bookings: {str(e)}")
+    except Exception:
+        logger.exception("Error fetching bookings")
         return jsonify({'success': False, 'error': 'Failed to fetch bookings. Please try again later.'}), 500
 
-@app.route('/api/bookings', methods=['GET'])
-def get_bookings_by_date():
-    try:
-        date_str = request.args.get('date')
-        if not date_str:
-            return jsonify({'error': 'Date parameter is required'}), 400
-
-        date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
-        
-        # Initialize slots for this date if they don't exist
-        existing_slots = TimeSlot.query.filter_by(date=date_obj).all()
-        if not existing_slots:
-            morning_slot = TimeSlot(
-                date=date_obj,
-                slot_time='10:00 AM',
-                capacity=50,
-                ticket_type='Regular',
-                booked_count=0
-            )
-            afternoon_slot = TimeSlot(
-                date=date_obj,
-                slot_time='2:00 PM',
-                capacity=50,
-                ticket_type='Regular',
-                booked_count=0
-            )
-            
-            db.session.add(morning_slot)
-            db.session.add(afternoon_slot)
-            try:
-                db.session.commit()
-                existing_slots = [morning_slot, afternoon_slot]
-            except Exception as e:
-                db.session.rollback()
-                print(f"Error creating slots: {str(e)}")
-                return jsonify({'error': 'Failed to create time slots'}), 500
-        
-        slots_info = []
-        for slot in existing_slots:
-            available = slot.capacity - slot.booked_count
-            slots_info.append({
-                'time': slot.slot_time,
-                'available': available,
-                'total': slot.capacity,
-                'booked': slot.booked_count,
-                'ticket_type': slot.ticket_type
-            })
-        
-        return jsonify({
-            'date': date_str,
-            'slots': slots_info
-        })
-        
-    except ValueError as e:
-        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
-    except Exception as e:
-        print(f"Error getting bookings for date: {str(e)}")
-        return jsonify({'error': 'Internal server error'}), 500
-
 # Pricing endpoint
 @app.route('/api/pricing', methods=['GET'])
 def get_pricing():
@@ -567,17 +656,11 @@ def get_pricing():
             return jsonify({'error': 'Missing required parameters'}), 400
             
         try:
-            date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
+            date_obj = date.fromisoformat(date_str)
         except ValueError:
             return jsonify({'error': 'Invalid date format'}), 400
             
-        pricing = Pricing.query.filter_by(
-            nationality=nationality,
-            ticket_type=ticket_type
-        ).filter(
-            Pricing.effective_from <= date_obj,
-            Pricing.effective_to >= date_obj
-        ).first()
+        pricing = get_pricing_cached(nationality, ticket_type, date_obj)
         
         if not pricing:
             return jsonify({'error': 'No pricing found for the selected options'}), 404
@@ -587,8 +670,8 @@ def get_pricing():
             'child_price': pricing.child_price
         })
         
-    except Exception as e:
-        print(f"Error in get_pricing: {str(e)}")
+    except Exception:
+        logger.exception("Error in get_pricing")
         return jsonify({'error': 'Internal server error'}), 500
 
 # Payment endpoints
@@ -622,9 +705,6 @@ def initialize_payment():
         )
         
         try:
-            # Start a transaction
-            db.session.begin_nested()
-            
             db.session.add(payment)
             
             # For demo purposes, automatically mark payment as completed
@@ -643,20 +723,20 @@ def initialize_payment():
                 db.session.rollback()
                 return jsonify({'error': 'Time slot not found'}), 404
                 
-            if time_slot.booked_count + 1 > time_slot.capacity:
+            if not reserve_capacity(time_slot.id, 1):
                 db.session.rollback()
                 return jsonify({'error': 'Not enough capacity available'}), 400
                 
-            time_slot.booked_count += 1
+            refresh_day_availability(booking.date)
+            booking_date = booking.date
             
             # Commit the transaction
             db.session.commit()
+            invalidate_calendar_cache(booking_date)
             
-            # Only send confirmation email after successful payment and database updates
-            email_sent = send_booking_confirmation(booking)
-            if not email_sent:
-                print("Warning: Failed to send confirmation email")
-                # Don't fail the payment if email fails, but log it
+            # Only send confirmation email after successful payment and database updates;
+            # it runs in the background so a slow or failed send never delays the payment
+            mail_executor.submit(send_booking_confirmation_async, booking.booking_id)
             
             return jsonify({
                 'success': True,
@@ -665,13 +745,13 @@ def initialize_payment():
                 'transaction_id': payment.transaction_id
             })
             
-        except Exception as e:
+        except Exception:
             db.session.rollback()
-            print(f"Error processing payment: {str(e)}")
+            logger.exception("Error processing payment")
             return jsonify({'error': 'Failed to process payment'}), 500
             
     except Exception as e:
-        print(f"Error in initialize_payment: {str(e)}")
+        logger.exception("Error in initialize_payment")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/payments/<payment_id>/status', methods=['GET'])
@@ -685,116 +765,156 @@ def get_payment_status(payment_id):
         return jsonify({'error': str(e)}), 400
 
 # Calendar endpoints
-@app.route('/api/calendar/monthly/<year>/<month>', methods=['GET'])
-def get_calendar_data(year, month):
-    try:
-        print(f"Processing calendar request for {year}/{month}")
-        
-        # Convert string parameters to integers
-        year = int(year)
-        month = int(month)
-        
-        # Get the first and last day of the month
-        first_day = datetime(year, month, 1).date()
-        if month == 12:
-            last_day = datetime(year + 1, 1, 1).date() - timedelta(days=1)
-        else:
-            last_day = datetime(year, month + 1, 1).date() - timedelta(days=1)
-        
-        print(f"Fetching slots between {first_day} and {last_day}")
-        
-        # Get all time slots for the month
-        slots = TimeSlot.query.filter(
-            TimeSlot.date >= first_day,
-            TimeSlot.date <= last_day
+MAX_BATCH_MONTHS = 12
+
+def is_month_pair(pair):
+    """True for a [year, month] list of two ints that build_month_calendar can take."""
+    if not isinstance(pair, list) or len(pair) != 2:
+        return False
+    if not all(isinstance(v, int) and not isinstance(v, bool) for v in pair):
+        return False
+    year, month = pair
+    # December needs the following January to find its last day, so MAXYEAR itself is out
+    return MINYEAR <= year < MAXYEAR and 1 <= month <= 12
+
+def build_month_calendar(year, month):
+    """Return the per-day availability for a month, served from the calendar cache when fresh."""
+    cached = _CALENDAR_CACHE.get((year, month))
+    if cached and time.time() - cached[0] < _CALENDAR_TTL:
+        return cached[1]
+    
+    # Get the first and last day of the month
+    first_day = datetime(year, month, 1).date()
+    if month == 12:
+        last_day = datetime(year + 1, 1, 1).date() - timedelta(days=1)
+    else:
+        last_day = datetime(year, month + 1, 1).date() - timedelta(days=1)
+    
+    logger.debug("Fetching slots between %s and %s", first_day, last_day)
+    
+    # Get all time slots for the month as plain column tuples, grouped by date
+    slots_by_date = defaultdict(list)
+    for slot in db.session.query(
+        TimeSlot.date,
+        TimeSlot.slot_time,
+        TimeSlot.capacity,
+        TimeSlot.booked_count
+    ).filter(TimeSlot.date.between(first_day, last_day)).all():
+        slots_by_date[slot.date].append(slot)
+    
+    # Day totals come from the materialized availability table
+    availability = {
+        row.date: row for row in DayAvailability.query.filter(
+            DayAvailability.date.between(first_day, last_day)
         ).all()
+    }
+    
+    # Compute and store rows for days that have slots but no availability row yet
+    missing_rows = []
+    if any(slot_date not in availability for slot_date in slots_by_date):
+        for slot_date, total_capacity, total_available in db.session.query(
+            TimeSlot.date,
+            func.sum(TimeSlot.capacity),
+            func.sum(TimeSlot.capacity - TimeSlot.booked_count)
+        ).filter(
+            TimeSlot.date.between(first_day, last_day)
+        ).group_by(TimeSlot.date).all():
+            if slot_date in availability:
+                continue
+            row = DayAvailability(
+                date=slot_date,
+                total_capacity=total_capacity,
+                total_available=total_available,
+                status=DayAvailability.status_for(total_capacity, total_available)
+            )
+            availability[slot_date] = row
+            missing_rows.append(row)
+    
+    # Create calendar data
+    calendar_data = {}
+    current_date = first_day
+    
+    while current_date <= last_day:
+        day_slots = slots_by_date.get(current_date, ())
+        day = availability.get(current_date)
         
-        # Create calendar data
-        calendar_data = {}
-        current_date = first_day
-        today = datetime.now().date()
-        
-        while current_date <= last_day:
-            # Get slots for current date
-            day_slots = [s for s in slots if s.date == current_date]
-            
-            # For future dates with no slots, create default slots
-            if not day_slots and current_date >= today:
-                try:
-                    morning_slot = TimeSlot(
-                        date=current_date,
-                        slot_time='10:00 AM',
-                        capacity=50,
-                        ticket_type='Regular',
-                        booked_count=0
-                    )
-                    afternoon_slot = TimeSlot(
-                        date=current_date,
-                        slot_time='2:00 PM',
-                        capacity=50,
-                        ticket_type='Regular',
-                        booked_count=0
-                    )
-                    db.session.add(morning_slot)
-                    db.session.add(afternoon_slot)
-                    db.session.commit()
-                    day_slots = [morning_slot, afternoon_slot]
-                    print(f"Created default slots for {current_date}")
-                except Exception as e:
-                    print(f"Error creating slots for {current_date}: {str(e)}")
-                    db.session.rollback()
-            
-            # Calculate availability
-            if day_slots:
-                slot_data = []
-                total_available = 0
-                total_capacity = 0
-                
-                for slot in day_slots:
-                    available = slot.capacity - slot.booked_count
-                    total_available += available
-                    total_capacity += slot.capacity
-                    
-                    slot_data.append({
-                        'time': slot.slot_time,
-                        'available': available,
-                        'capacity': slot.capacity,
-                        'booked': slot.booked_count
-                    })
-                
-                # Determine overall status
-                if total_capacity == 0:
-                    status = 'unavailable'
-                elif total_available == 0:
-                    status = 'full'
-                elif total_available <= 5:  # Limited availability threshold
-                    status = 'limited'
-                else:
-                    status = 'available'
-                    
-                calendar_data[current_date.strftime('%Y-%m-%d')] = {
-                    'status': status,
-                    'slots': slot_data,
-                    'total_available': total_available,
-                    'total_capacity': total_capacity
-                }
-            else:
-                calendar_data[current_date.strftime('%Y-%m-%d')] = {
-                    'status': 'unavailable',
-                    'slots': [],
-                    'total_available': 0,
-                    'total_capacity': 0
-                }
-            
-            current_date += timedelta(days=1)
+        if day_slots and day:
+            calendar_data[current_date.strftime('%Y-%m-%d')] = {
+                'status': day.status,
+                'slots': [{
+                    'time': slot.slot_time,
+                    'available': slot.capacity - slot.booked_count,
+                    'capacity': slot.capacity,
+                    'booked': slot.booked_count
+                } for slot in day_slots],
+                'total_available': day.total_available,
+                'total_capacity': day.total_capacity
+            }
+        else:
+            calendar_data[current_date.strftime('%Y-%m-%d')] = {
+                'status': 'unavailable',
+                'slots': [],
+                'total_available': 0,
+                'total_capacity': 0
+            }
         
-        return jsonify(calendar_data)
+        current_date += timedelta(days=1)
+    
+    if missing_rows:
+        try:
+            db.session.add_all(missing_rows)
+            db.session.commit()
+        except Exception:
+            logger.exception("Error storing day availability")
+            db.session.rollback()
+    
+    store_calendar((year, month), (time.time(), calendar_data))
+    
+    return calendar_data
+
+@app.route('/api/calendar/monthly/<year>/<month>', methods=['GET'])
+def get_calendar_data(year, month):
+    try:
+        logger.debug("Processing calendar request for %s/%s", year, month)
+        # This is the only calendar cache with a TTL: the gateway, frontend and browsers revalidate
+        # against it with the ETag on every request instead of keeping their own copies fresh
+        response = jsonify(build_month_calendar(int(year), int(month)))
+        response.add_etag()
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
         
     except Exception as e:
-        print(f"Error processing calendar request: {str(e)}")
-        traceback.print_exc()
+        logger.exception("Error processing calendar request")
         return jsonify({'error': str(e)}), 400
 
+@app.route('/api/calendar/monthly_batch', methods=['POST'])
+def get_calendar_batch():
+    """Return several months at once, keyed by 'YYYY-MM'."""
+    data = request.get_json(silent=True)
+    months = data.get('months') if isinstance(data, dict) else None
+    if not isinstance(months, list) or not months:
+        return jsonify({'error': 'months must be a non-empty list of [year, month] pairs'}), 400
+    if len(months) > MAX_BATCH_MONTHS:
+        return jsonify({'error': f'At most {MAX_BATCH_MONTHS} months per request'}), 400
+    if not all(is_month_pair(pair) for pair in months):
+        return jsonify({'error': 'Each month must be a [year, month] pair of integers with month 1-12'}), 400
+    
+    try:
+        result = {}
+        for year, month in months:
+            result[f"{year:04d}-{month:02d}"] = build_month_calendar(year, month)
+        return jsonify(result)
+        
+    except Exception:
+        logger.exception("Error processing calendar batch request")
+        return jsonify({'error': 'Failed to load calendar'}), 500
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create tables, reset pricing and precreate time slots (run once per deploy, not per worker)."""
+    init_db()
+
 if __name__ == '__main__':
     init_db()
+    schedule_slot_refresh()
     app.run(port=BACKEND_PORT, debug=True)
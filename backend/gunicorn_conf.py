@@ -0,0 +1,27 @@
+# Production entrypoint: gunicorn -c backend/gunicorn_conf.py --chdir backend wsgi:app
+# wsgi.py monkey-patches with gevent, so each worker overlaps many in-flight requests
+import os
+import subprocess
+import sys
+
+bind = f"0.0.0.0:{os.getenv('BACKEND_PORT', 5002)}"
+worker_class = 'gevent'
+workers = int(os.getenv('BACKEND_WORKERS', 4))
+worker_connections = 1000
+timeout = 30
+# The gateway keeps a pool of keep-alive connections to the backend; gunicorn's 2 s default
+# closes them between bursts and forces a fresh TCP handshake (or a retry on a dead socket)
+keepalive = 75
+
+
+def on_starting(server):
+    """Initialise the database once, before any worker starts, instead of once per worker.
+
+    Runs as a separate process so the master never imports the app (workers import it after
+    wsgi.py has monkey-patched with gevent).
+    """
+    subprocess.run(
+        [sys.executable, '-m', 'flask', '--app', 'app', 'init-db'],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        check=True
+    )
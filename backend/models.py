@@ -1,7 +1,10 @@
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
+import logging
 import uuid
 
+logger = logging.getLogger('backend')
+
 db = SQLAlchemy()
 
 def generate_booking_id():
@@ -45,8 +48,8 @@ class Booking(db.Model):
                 'payment_status': self.payment_status,
                 'payment': self.payment.to_dict() if self.payment else None
             }
-        except Exception as e:
-            print(f"Error in Booking.to_dict: {str(e)}")
+        except Exception:
+            logger.exception("Error in Booking.to_dict")
             return {
                 'id': self.booking_id,
                 'error': 'Error converting booking to dictionary'
@@ -74,6 +77,27 @@ class TimeSlot(db.Model):
         self.booked_count += count
         db.session.commit()
 
+class DayAvailability(db.Model):
+    __tablename__ = 'day_availability'
+    
+    date = db.Column(db.Date, primary_key=True)
+    total_capacity = db.Column(db.Integer, nullable=False, default=0)
+    total_available = db.Column(db.Integer, nullable=False, default=0)
+    status = db.Column(db.String(20), nullable=False, default='unavailable')
+    
+    LIMITED_THRESHOLD = 5
+    
+    @classmethod
+    def status_for(cls, total_capacity, total_available):
+        """Derive the calendar status for a day from its aggregated slot numbers."""
+        if total_capacity == 0:
+            return 'unavailable'
+        if total_available == 0:
+            return 'full'
+        if total_available <= cls.LIMITED_THRESHOLD:
+            return 'limited'
+        return 'available'
+
 class Pricing(db.Model):
     __tablename__ = 'pricing'
     
@@ -87,6 +111,7 @@ class Pricing(db.Model):
     
     __table_args__ = (
         db.UniqueConstraint('nationality', 'ticket_type', 'effective_from', name='unique_pricing'),
+        db.Index('ix_pricing_lookup', 'nationality', 'ticket_type', 'effective_from', 'effective_to'),
     )
 
 class Payment(db.Model):
@@ -99,6 +124,10 @@ class Payment(db.Model):
     payment_method = db.Column(db.String(50), nullable=False)
     transaction_id = db.Column(db.String(100), unique=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_payment_booking', 'booking_id'),
+    )
 
     def to_dict(self):
         return {
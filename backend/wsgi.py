@@ -0,0 +1,11 @@
+# Production entrypoint: gunicorn -c backend/gunicorn_conf.py --chdir backend wsgi:app
+# Patch the standard library before Flask/SQLAlchemy are imported so blocking I/O yields to other requests
+from gevent import monkey
+monkey.patch_all()
+
+import os
+
+from app import app, schedule_slot_refresh, INSTANCE_PATH
+
+# init_db runs once in gunicorn_conf.on_starting; of the workers, only the lock holder refreshes slots
+schedule_slot_refresh(lock_path=os.path.join(INSTANCE_PATH, 'slot-refresh.lock'))
@@ -1,21 +1,138 @@
-from flask import Flask, render_template, request, jsonify, session
+from gevent import monkey
+monkey.patch_all()
+
+from flask import Flask, render_template, request, jsonify, session, Response, stream_with_context
+from flask.json.provider import JSONProvider
 from flask_socketio import SocketIO, emit
 import requests
+import threading
+import orjson
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
+import logging
 from dotenv import load_dotenv
-import traceback
 
 # Load environment variables
 load_dotenv()
 
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO').upper())
+logger = logging.getLogger('frontend')
+
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key')
-socketio = SocketIO(app)
+
+class OrjsonProvider(JSONProvider):
+    """JSON provider backed by orjson, which encodes and decodes much faster than the stdlib."""
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj), mimetype='application/json')
+
+app.json = OrjsonProvider(app)
+socketio = SocketIO(app, async_mode='gevent')
 
 # Service URLs from environment
 GATEWAY_URL = os.getenv('GATEWAY_URL', 'http://localhost:5001')
 FRONTEND_PORT = int(os.getenv('FRONTEND_PORT', 5003))
 
+# Cap on in-flight gateway calls so a burst of clients can't stampede the gateway
+GATEWAY_CONCURRENCY = int(os.getenv('GATEWAY_CONCURRENCY', 100))
+GATEWAY_SLOTS = threading.BoundedSemaphore(GATEWAY_CONCURRENCY)
+# Seconds to wait on the gateway, so a stalled call can't hold a slot indefinitely
+GATEWAY_TIMEOUT = float(os.getenv('GATEWAY_TIMEOUT', 10))
+
+# Shared HTTP session so gateway calls reuse pooled keep-alive connections
+SESSION = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=50,
+    pool_maxsize=GATEWAY_CONCURRENCY,
+    max_retries=Retry(total=3, backoff_factor=0.1, status_forcelist=[502, 503, 504])
+)
+SESSION.mount('http://', _adapter)
+SESSION.mount('https://', _adapter)
+SESSION.headers.update({'Content-Type': 'application/json'})
+
+def gateway_request(method, path, **kwargs):
+    """Call the gateway through the shared session, waiting for a free slot first.
+
+    A streamed response keeps its slot until release_gateway_response() is called on it.
+    """
+    if 'json' in kwargs:
+        kwargs['data'] = orjson.dumps(kwargs.pop('json'))
+    kwargs.setdefault('timeout', GATEWAY_TIMEOUT)
+    if not kwargs.get('stream'):
+        with GATEWAY_SLOTS:
+            return SESSION.request(method, f"{GATEWAY_URL}{path}", **kwargs)
+    
+    GATEWAY_SLOTS.acquire()
+    try:
+        response = SESSION.request(method, f"{GATEWAY_URL}{path}", **kwargs)
+    except BaseException:
+        GATEWAY_SLOTS.release()
+        raise
+    response.holds_gateway_slot = True
+    return response
+
+def release_gateway_response(response):
+    """Close a gateway response and free its slot; safe to call more than once."""
+    holds_slot = response.__dict__.pop('holds_gateway_slot', False)
+    response.close()
+    if holds_slot:
+        GATEWAY_SLOTS.release()
+
+def gateway_json(response):
+    """Decode a gateway response body with orjson."""
+    return orjson.loads(response.content)
+
+def stream_body(response, chunk_size=8192, on_complete=None):
+    """Relay a streamed gateway response in chunks, releasing its connection and slot when done.
+
+    If on_complete is given it is called with the full body once the stream finishes.
+    """
+    chunks = [] if on_complete else None
+    try:
+        for chunk in response.iter_content(chunk_size):
+            if chunks is not None:
+                chunks.append(chunk)
+            yield chunk
+        if on_complete:
+            on_complete(b''.join(chunks))
+    finally:
+        release_gateway_response(response)
+
+# Last monthly calendar body seen, keyed by (year, month): (body, etag, last_modified). Entries are
+# never served without revalidating with the gateway; they only let a 304 skip refetching the body.
+_CALENDAR_CACHE = {}
+_CALENDAR_CACHE_SIZE = 512
+
+def store_calendar(key, body, etag, last_modified):
+    """Cache a month, evicting the least recently fetched one when full instead of dropping them all."""
+    _CALENDAR_CACHE.pop(key, None)
+    while len(_CALENDAR_CACHE) >= _CALENDAR_CACHE_SIZE:
+        _CALENDAR_CACHE.pop(next(iter(_CALENDAR_CACHE)), None)
+    _CALENDAR_CACHE[key] = (body, etag, last_modified)
+
+def calendar_response(response, etag=None, last_modified=None):
+    """Attach caching headers to a calendar response and honour the browser's conditional headers."""
+    # Browsers keep the body but revalidate every time, so a booked day never shows as free from their cache
+    response.headers['Cache-Control'] = 'no-cache'
+    if etag:
+        response.headers['ETag'] = etag
+    if last_modified:
+        response.headers['Last-Modified'] = last_modified
+    return response.make_conditional(request)
+
+def cached_calendar_response(entry):
+    body, etag, last_modified = entry
+    return calendar_response(Response(body, content_type='application/json'), etag, last_modified)
+
 @app.route('/')
 def index():
     return render_template('index.html', gateway_url=GATEWAY_URL)
@@ -31,181 +148,190 @@ def handle_connect():
 @socketio.on('send_message')
 def handle_message(data):
     try:
-        # Send message to API Gateway
-        response = requests.post(
-            f"{GATEWAY_URL}/api/chat/message",
-            json={'message': data['message']}
+        # Hand the gateway call off so the handler returns straight away
+        socketio.start_background_task(forward_chat, request.sid, data['message'])
+    except Exception as e:
+        emit('error', {'message': str(e)})
+
+def forward_chat(sid, message):
+    """Send a chat message to the API Gateway and emit its reply to the client's room."""
+    try:
+        response = gateway_request(
+            'POST', '/api/chat/message',
+            json={'message': message}
         )
-        response_data = response.json()
+        response_data = gateway_json(response)
         
         # Process the response based on intent
         if response_data.get('intent') == 'booking':
-            emit('response', {
+            socketio.emit('response', {
                 'message': response_data['message'],
                 'action': response_data['next_action']
-            })
+            }, to=sid)
         else:
-            emit('response', {'message': response_data['message']})
+            socketio.emit('response', {'message': response_data['message']}, to=sid)
     except Exception as e:
-        emit('error', {'message': str(e)})
+        socketio.emit('error', {'message': str(e)}, to=sid)
+
+BOOKING_REQUIRED_FIELDS = frozenset(('email', 'date', 'timeSlot', 'adults'))
 
 @app.route('/api/booking/create', methods=['POST'])
 def create_booking():
-    print("\n")
-    print("="*50)
-    print("BOOKING CREATION STARTED")
-    print("="*50)
-    print("\nRequest Data:", request.get_data())
-    print("Request JSON:", request.get_json())
-    
     try:
         # Validate request data
         if not request.is_json:
-            print("ERROR: No JSON data received")
+            logger.warning("Booking request without JSON data")
             return jsonify({'error': 'No JSON data received'}), 400
             
         booking_data = request.get_json()
-        if not booking_data:
-            print("ERROR: Empty JSON data")
+        if not booking_data or not isinstance(booking_data, dict):
+            logger.warning("Booking request with empty JSON data")
             return jsonify({'error': 'Empty booking data'}), 400
             
-        required_fields = ['email', 'date', 'timeSlot', 'adults']
-        missing_fields = [field for field in required_fields if field not in booking_data]
+        missing_fields = BOOKING_REQUIRED_FIELDS - booking_data.keys()
         if missing_fields:
-            print(f"ERROR: Missing required fields: {missing_fields}")
+            missing_fields = sorted(missing_fields)
+            logger.warning("Booking request missing fields: %s", missing_fields)
             return jsonify({'error': f'Missing required fields: {", ".join(missing_fields)}'}), 400
             
-        print("\nValidated booking data:", booking_data)
+        # Coerce visitor counts once; bad values are a client error, not a server one
+        try:
+            adults = int(booking_data['adults'])
+            children = int(booking_data.get('children') or 0)
+        except (TypeError, ValueError):
+            logger.warning("Booking request with invalid visitor counts")
+            return jsonify({'error': 'adults and children must be whole numbers'}), 400
+            
+        logger.debug("Validated booking data: %s", booking_data)
         
-        # Send booking request to gateway
-        gateway_url = f"{GATEWAY_URL}/api/bookings/create"
-        print(f"\nSending booking request to gateway: {gateway_url}")
-        print("Request data:", booking_data)
+        # Create the booking and send its confirmation email in a single gateway call
+        payload = {
+            'booking': booking_data,
+            'email': {
+                'to_email': booking_data['email'],
+                'booking_details': {
+                    'date': booking_data['date'],
+                    'timeSlot': booking_data['timeSlot'],
+                    'adults': adults,
+                    'children': children
+                }
+            }
+        }
+        gateway_path = '/api/bookings/create_and_notify'
+        logger.debug("Sending booking request to gateway %s%s: %s", GATEWAY_URL, gateway_path, payload)
         
-        response = requests.post(
-            gateway_url,
-            json=booking_data,
-            headers={'Content-Type': 'application/json'}
-        )
+        # Pass the client's Idempotency-Key through so the gateway can collapse double submits
+        idem = request.headers.get('Idempotency-Key')
+        headers = {'Idempotency-Key': idem} if idem else None
+        response = gateway_request('POST', gateway_path, json=payload, headers=headers)
         
-        print("\nGateway Response:")
-        print(f"Status Code: {response.status_code}")
-        print(f"Response Headers: {dict(response.headers)}")
-        print(f"Response Body: {response.text}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Gateway response %s headers=%s body=%s",
+                         response.status_code, dict(response.headers), response.text)
         
         if not response.ok:
-            print("ERROR: Gateway returned error response")
-            return jsonify(response.json()), response.status_code
+            logger.warning("Gateway rejected booking with status %s", response.status_code)
+            return jsonify(gateway_json(response)), response.status_code
             
         # Process gateway response
         try:
-            gateway_response = response.json()
-        except ValueError as e:
-            print("ERROR: Invalid JSON response from gateway")
+            gateway_response = gateway_json(response)
+        except ValueError:
+            logger.error("Invalid JSON response from gateway")
             return jsonify({'error': 'Invalid response from gateway'}), 500
             
         booking_id = gateway_response.get('booking_id')
         if not booking_id:
-            print("ERROR: No booking ID in gateway response")
-            print("Gateway response:", gateway_response)
+            logger.error("No booking ID in gateway response: %s", gateway_response)
             return jsonify({'error': 'No booking ID received'}), 500
             
-        print("\nBooking created successfully")
-        print("Booking ID:", booking_id)
-        
-        # Send confirmation email
-        print("\n")
-        print("="*50)
-        print("SENDING CONFIRMATION EMAIL")
-        print("="*50)
-        
-        email_data = {
-            'to_email': booking_data['email'],
-            'booking_id': booking_id,
-            'booking_details': {
-                'date': booking_data['date'],
-                'timeSlot': booking_data['timeSlot'],
-                'adults': int(booking_data.get('adults', 0)),
-                'children': int(booking_data.get('children', 0)),
-                'amount': float(gateway_response.get('amount', 0))
-            }
-        }
-        
-        print("\nEmail request data:", email_data)
-        
-        try:
-            email_url = f"{GATEWAY_URL}/api/email/send"
-            print(f"\nSending email request to: {email_url}")
-            
-            email_response = requests.post(
-                email_url,
-                json=email_data,
-                headers={'Content-Type': 'application/json'}
-            )
-            
-            print("\nEmail Response:")
-            print(f"Status Code: {email_response.status_code}")
-            print(f"Response Headers: {dict(email_response.headers)}")
-            print(f"Response Body: {email_response.text}")
-            
-            if not email_response.ok:
-                print("WARNING: Failed to send email")
-                gateway_response['email_status'] = 'failed'
-            else:
-                print("Email sent successfully")
-                gateway_response['email_status'] = 'sent'
-                
-        except Exception as e:
-            print("\nERROR: Exception while sending email:")
-            print(f"Error Type: {type(e).__name__}")
-            print(f"Error Message: {str(e)}")
-            gateway_response['email_status'] = 'failed'
-            
-        print("\n")
-        print("="*50)
-        print("BOOKING CREATION COMPLETED")
-        print("="*50)
+        gateway_response.setdefault('email_status', 'failed')
+        logger.info("Booking %s created, email %s", booking_id, gateway_response['email_status'])
         return jsonify(gateway_response), 200
         
     except Exception as e:
-        print("\nERROR: Unexpected exception:")
-        print(f"Error Type: {type(e).__name__}")
-        print(f"Error Message: {str(e)}")
-        print("Traceback:")
-        print(traceback.format_exc())
+        logger.exception("Unexpected error creating booking")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/booking/<booking_id>', methods=['GET'])
 def get_booking(booking_id):
     try:
-        response = requests.get(f"{GATEWAY_URL}/api/bookings/{booking_id}")
-        return jsonify(response.json()), response.status_code
-    except requests.RequestException as e:
+        response = gateway_request('GET', f"/api/bookings/{booking_id}")
+        return jsonify(gateway_json(response)), response.status_code
+    except requests.RequestException:
         return jsonify({'error': 'Gateway service unavailable'}), 503
 
-@app.route('/api/calendar/monthly/<year>/<month>', methods=['GET'])
+@app.route('/api/calendar/monthly/<int:year>/<int:month>', methods=['GET'])
 def get_calendar(year, month):
     try:
-        print(f"Frontend: Fetching calendar for {year}/{month}")  # Debug log
-        response = requests.get(
-            f"{GATEWAY_URL}/api/calendar/monthly/{year}/{month}",
-            headers={'Content-Type': 'application/json'}
-        )
+        logger.debug("Fetching calendar for %s/%s", year, month)
+        key = (year, month)
+        cached = _CALENDAR_CACHE.get(key)
+        
+        # Revalidate a cached entry with the gateway instead of refetching the whole month
+        headers = {'If-None-Match': cached[1]} if cached and cached[1] else {}
+        response = gateway_request('GET', f"/api/calendar/monthly/{year}/{month}", headers=headers, stream=True)
+        if response.status_code == 304 and cached:
+            release_gateway_response(response)
+            store_calendar(key, *cached)
+            return cached_calendar_response(cached)
+        
+        content_type = response.headers.get('Content-Type', 'application/json')
         if not response.ok:
-            print(f"Frontend: Gateway error - {response.status_code}")  # Debug log
-            return jsonify(response.json()), response.status_code
-        return jsonify(response.json()), response.status_code
+            logger.warning("Gateway returned %s for calendar %s/%s", response.status_code, year, month)
+            relay = Response(
+                stream_with_context(stream_body(response)),
+                status=response.status_code,
+                content_type=content_type
+            )
+            # stream_body's cleanup never runs if the body isn't iterated (client gone, 304 to the browser)
+            relay.call_on_close(lambda: release_gateway_response(response))
+            return relay
+        
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        body = stream_body(
+            response,
+            on_complete=lambda data: store_calendar(key, data, etag, last_modified)
+        )
+        # direct_passthrough stops make_conditional from buffering the whole body to compute Content-Length
+        relay = Response(stream_with_context(body), content_type=content_type, direct_passthrough=True)
+        relay.call_on_close(lambda: release_gateway_response(response))
+        return calendar_response(relay, etag, last_modified)
+    except requests.RequestException as e:
+        logger.error("Calendar request to gateway failed: %s", e)
+        return jsonify({'error': 'Gateway service unavailable'}), 503
+
+@app.route('/api/calendar/monthly_batch', methods=['POST'])
+def get_calendar_batch():
+    """Return several months keyed by 'YYYY-MM', fetched from the gateway in one call."""
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({'error': 'months must be a list of [year, month] pairs'}), 400
+    try:
+        keys = [(int(year), int(month)) for year, month in data.get('months') or ()]
+    except (TypeError, ValueError):
+        return jsonify({'error': 'months must be a list of [year, month] pairs'}), 400
+    if not keys:
+        return jsonify({'error': 'months must be a list of [year, month] pairs'}), 400
+    
+    # Batches carry no ETag to revalidate with, so they always come from the backend's calendar cache
+    try:
+        response = gateway_request('POST', '/api/calendar/monthly_batch', json={'months': keys})
     except requests.RequestException as e:
-        print(f"Frontend: Request exception - {str(e)}")  # Debug log
+        logger.error("Calendar batch request to gateway failed: %s", e)
         return jsonify({'error': 'Gateway service unavailable'}), 503
+    if not response.ok:
+        logger.warning("Gateway returned %s for calendar batch %s", response.status_code, keys)
+    return Response(response.content, status=response.status_code, content_type='application/json')
 
 @app.route('/test', methods=['GET'])
 def test_endpoint():
-    print("TEST ENDPOINT CALLED")
+    logger.debug("Test endpoint called")
     return jsonify({"status": "ok"})
 
 if __name__ == '__main__':
     print("=== Frontend Server Starting ===")
     print(f"Frontend URL: http://localhost:{FRONTEND_PORT}")
     print(f"Gateway URL: {GATEWAY_URL}")
-    socketio.run(app, port=FRONTEND_PORT, debug=True)
+    socketio.run(app, port=FRONTEND_PORT)
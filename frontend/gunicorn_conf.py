@@ -0,0 +1,12 @@
+# Production entrypoint: gunicorn -c frontend/gunicorn_conf.py --chdir frontend app:app
+# app.py monkey-patches with gevent on import, so the gevent worker serves Socket.IO and HTTP cooperatively
+import os
+
+bind = f"0.0.0.0:{os.getenv('FRONTEND_PORT', 5003)}"
+worker_class = 'gevent'
+# Socket.IO clients must keep hitting the same worker; only raise this behind a sticky-session load balancer
+workers = int(os.getenv('FRONTEND_WORKERS', 1))
+worker_connections = 1000
+keepalive = 65
+# Import the app in each worker after the fork so every worker builds its own gateway connection pool
+preload_app = False
@@ -927,6 +927,54 @@ function displayBooking(booking) {
     }
 }
 
+// Calendar months requested within this window are fetched together in one batch call
+const CALENDAR_BATCH_WINDOW_MS = 5;
+let pendingCalendarMonths = new Map();
+let calendarBatchTimer = null;
+
+function requestCalendarMonth(year, month) {
+    const key = `${year}-${String(month).padStart(2, '0')}`;
+    return new Promise((resolve, reject) => {
+        let entry = pendingCalendarMonths.get(key);
+        if (!entry) {
+            entry = { year, month, waiters: [] };
+            pendingCalendarMonths.set(key, entry);
+        }
+        entry.waiters.push({ resolve, reject });
+        if (!calendarBatchTimer) {
+            calendarBatchTimer = setTimeout(flushCalendarBatch, CALENDAR_BATCH_WINDOW_MS);
+        }
+    });
+}
+
+async function flushCalendarBatch() {
+    const batch = pendingCalendarMonths;
+    pendingCalendarMonths = new Map();
+    calendarBatchTimer = null;
+
+    try {
+        const response = await fetch('/api/calendar/monthly_batch', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'Accept': 'application/json'
+            },
+            body: JSON.stringify({
+                months: Array.from(batch.values(), entry => [entry.year, entry.month])
+            })
+        });
+
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+
+        const data = await response.json();
+        batch.forEach((entry, key) => entry.waiters.forEach(waiter => waiter.resolve(data[key] || {})));
+    } catch (error) {
+        batch.forEach(entry => entry.waiters.forEach(waiter => waiter.reject(error)));
+    }
+}
+
 // Fetch calendar data
 async function fetchCalendarData(year, month) {
     try {
@@ -939,20 +987,14 @@ async function fetchCalendarData(year, month) {
             }
         });
 
-        const response = await fetch(`${BACKEND_URL}/api/calendar/monthly/${year}/${month}`, {
-            method: 'GET',
-            headers: {
-                'Content-Type': 'application/json',
-                'Accept': 'application/json'
-            },
-            credentials: 'include'
-        });
+        const dataPromise = requestCalendarMonth(year, month);
 
-        if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
-        }
+        // Prefetch the next month in the same batch so the backend has it cached when the user pages forward
+        const nextYear = month === 12 ? year + 1 : year;
+        const nextMonth = month === 12 ? 1 : month + 1;
+        requestCalendarMonth(nextYear, nextMonth).catch(() => {});
 
-        const data = await response.json();
+        const data = await dataPromise;
         console.log('Calendar data received:', data); // Debug log
         renderCalendar(data);
 
@@ -1151,7 +1193,7 @@ async function createBooking(bookingData) {
         } else {
             const emailResult = await emailResponse.json();
             console.log('Email response:', emailResult);
-            data.email_status = 'sent';
+            data.email_status = emailResponse.status === 202 ? 'queued' : 'sent';
         }
 
         return data;
@@ -1,48 +1,138 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, make_response, abort, g
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
-from flask_jwt_extended import JWTManager, create_access_token
+from flask_jwt_extended import JWTManager, create_access_token, verify_jwt_in_request, get_jwt_identity
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 import requests
+import orjson
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
 from dotenv import load_dotenv
 import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import traceback
+from email.message import EmailMessage
+from string import Template
 import time
+import threading
+import hashlib
+import queue
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener
+from contextlib import contextmanager
+from functools import wraps
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
 
 # Add these utility functions after your imports
 
-def handle_backend_error(response):
-    """Handle error responses from the backend."""
+def backend_error_message(response, default=None):
+    """Pull the 'error' message out of a backend error response, falling back to a generic one."""
     try:
-        error_data = response.json()
-        error_msg = error_data.get('error', f'Backend error: {response.status_code}')
-    except:
-        error_msg = f'Backend error: {response.status_code}'
-    return jsonify({'error': error_msg}), response.status_code
-
-def validate_request_data(data, required_fields):
-    """Validate request data contains all required fields."""
+        error_data = orjson.loads(response.content)
+    except ValueError:
+        error_data = None
+    if isinstance(error_data, dict) and error_data.get('error'):
+        return error_data['error']
+    return default or f'Backend error: {response.status_code}'
+
+def backend_failure(exc):
+    """Map a backend call that raised to an (error body, status) pair: 504 on timeout, else 503."""
+    if isinstance(exc, requests.Timeout):
+        return {'error': 'Backend service timeout'}, 504
+    if isinstance(exc, CircuitOpenError):
+        return {'error': 'Backend service degraded'}, 503
+    if isinstance(exc, BackendBusyError):
+        return {'error': 'Backend service busy'}, 503
+    return {'error': 'Backend service unavailable'}, 503
+
+def iter_body(response, chunk_size=8192):
+    """Yield a streamed backend body in chunks, releasing its connection when done."""
+    try:
+        yield from response.iter_content(chunk_size)
+    finally:
+        release_backend_response(response)
+
+def relay_response(response, stream=False):
+    """Return a backend response body as-is instead of parsing and re-encoding it.
+    
+    With stream=True the body is passed through chunk by chunk rather than buffered.
+    """
+    relay = Response(
+        iter_body(response) if stream else response.content,
+        status=response.status_code,
+        content_type=response.headers.get('Content-Type', 'application/json')
+    )
+    if stream:
+        # iter_body's finally only runs once iteration starts; a client that disconnects first
+        # would otherwise keep the pooled backend connection checked out for good
+        relay.call_on_close(lambda: release_backend_response(response))
+    return relay
+
+def content_etag(body):
+    """Short content hash of a response body, used as its ETag."""
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+def cacheable_response(response, etag, max_age):
+    """Mark a response as cacheable for max_age seconds and answer If-None-Match with a 304."""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f'public, max-age={max_age}'
+    return response.make_conditional(request)
+
+def validate_request_data(data, required_fields, max_lengths=None, max_fields=None):
+    """Validate request data contains all required fields, at most max_fields fields, and no field over its max length."""
     if not data:
         return False, 'No data provided'
     
+    if max_fields is not None and len(data) > max_fields:
+        return False, f'Too many fields (at most {max_fields})'
+    
     missing_fields = [field for field in required_fields if field not in data]
     if missing_fields:
         return False, f'Missing required fields: {", ".join(missing_fields)}'
     
+    too_long = [field for field, limit in (max_lengths or {}).items()
+                if field in data and len(str(data[field])) > limit]
+    if too_long:
+        return False, f'Fields too long: {", ".join(too_long)}'
+    
     return True, None
 
 def log_error(error_type, error_message):
     """Centralized error logging."""
-    print(f"Gateway Error - {error_type}: {error_message}")  # You can enhance this with proper logging
+    logger.error("%s: %s", error_type, error_message)
 
 # Load environment variables
 load_dotenv()
 
+# Set up logging; records are queued and written by a listener thread so request threads never block on I/O
+log_queue = queue.Queue(-1)
+logging.basicConfig(
+    level=os.getenv('LOG_LEVEL', 'INFO').upper(),
+    handlers=[QueueHandler(log_queue)]
+)
+log_listener = QueueListener(log_queue, logging.StreamHandler())
+log_listener.start()
+atexit.register(log_listener.stop)
+logger = logging.getLogger('gateway')
+
 app = Flask(__name__)
 
+class OrjsonProvider(JSONProvider):
+    """JSON provider backed by orjson, which encodes and decodes much faster than the stdlib."""
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj), mimetype='application/json')
+
+app.json = OrjsonProvider(app)
+
 # Email Configuration
 SMTP_SERVER = os.getenv('SMTP_SERVER')
 SMTP_PORT = int(os.getenv('SMTP_PORT', 587))
@@ -50,11 +140,123 @@ SMTP_USERNAME = os.getenv('SMTP_USERNAME')
 SMTP_PASSWORD = os.getenv('SMTP_PASSWORD')
 SENDER_EMAIL = os.getenv('SENDER_EMAIL')
 
+# Settings are read once at startup, so check them once too rather than on every request
+SMTP_MISSING = [name for name, value in (
+    ('SMTP_SERVER', SMTP_SERVER),
+    ('SMTP_PORT', SMTP_PORT),
+    ('SMTP_USERNAME', SMTP_USERNAME),
+    ('SMTP_PASSWORD', SMTP_PASSWORD),
+    ('SENDER_EMAIL', SENDER_EMAIL),
+) if not value]
+SMTP_CONFIG_ERROR = f"Missing SMTP configuration: {', '.join(SMTP_MISSING)}" if SMTP_MISSING else None
+if SMTP_CONFIG_ERROR:
+    logger.warning("%s; confirmation emails are disabled", SMTP_CONFIG_ERROR)
+
 # Get URLs from environment
 FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost:5003')
 BACKEND_URL = os.getenv('BACKEND_URL', 'http://localhost:5002')
 GATEWAY_PORT = int(os.getenv('GATEWAY_PORT', 5001))
 
+# Backend endpoints, resolved once instead of formatted on every request
+BOOKINGS_URL = BACKEND_URL + '/api/bookings/'
+AVAILABILITY_URL = BACKEND_URL + '/api/bookings/availability/'
+BOOKING_CREATE_URL = BACKEND_URL + '/api/bookings/create'
+CALENDAR_URL = BACKEND_URL + '/api/calendar/monthly/'
+CALENDAR_BATCH_URL = BACKEND_URL + '/api/calendar/monthly_batch'
+PAYMENT_INIT_URL = BACKEND_URL + '/api/payments/initialize'
+PAYMENT_STATUS_URL = BACKEND_URL + '/api/payments/%s/status'
+
+# Cap on in-flight backend calls, matching the pool size so bursts wait for a pooled
+# connection instead of opening throwaway ones that are closed after one use
+BACKEND_POOL_SIZE = int(os.getenv('BACKEND_POOL_SIZE', 128))
+BACKEND_SLOTS = threading.BoundedSemaphore(BACKEND_POOL_SIZE)
+# Seconds to wait for a free slot before answering 503; requests can't bound urllib3's own pool wait
+BACKEND_POOL_TIMEOUT = float(os.getenv('BACKEND_POOL_TIMEOUT', 5))
+
+# Shared HTTP session so backend calls reuse pooled keep-alive connections
+SESSION = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=BACKEND_POOL_SIZE,
+    # raise_on_status=False relays the last 5xx once retries run out instead of raising RetryError,
+    # so a backend that is up but answering 503 doesn't count as a failure against the circuit breaker
+    max_retries=Retry(total=2, backoff_factor=0.1, status_forcelist=[502, 503, 504], raise_on_status=False)
+)
+SESSION.mount('http://', _adapter)
+SESSION.mount('https://', _adapter)
+# (connect, read) seconds for backend calls
+BACKEND_TIMEOUT = (3, 15)
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised instead of calling the backend while the circuit breaker is open."""
+
+class BackendBusyError(requests.ConnectionError):
+    """Raised when no backend slot frees up within BACKEND_POOL_TIMEOUT seconds."""
+
+class CircuitBreaker:
+    """Stops calling the backend for a while after repeated connection failures, so requests fail fast.
+    
+    After fail_max consecutive failures the circuit opens and calls raise CircuitOpenError. Once
+    reset_timeout seconds have passed a single trial call is let through: success closes the
+    circuit, failure opens it again. Only raised requests exceptions count; HTTP error statuses don't.
+    """
+    
+    def __init__(self, fail_max=5, reset_timeout=30):
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+    
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if time.time() - self._opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+    
+    def call(self, func, *args, **kwargs):
+        with self._lock:
+            state = self.state
+            if state == 'open' or (state == 'half-open' and self._trial_in_flight):
+                raise CircuitOpenError('Backend circuit breaker is open')
+            trial = state == 'half-open'
+            if trial:
+                self._trial_in_flight = True
+        
+        try:
+            result = func(*args, **kwargs)
+        except requests.RequestException:
+            with self._lock:
+                self._failures += 1
+                if trial or self._failures >= self.fail_max:
+                    if self._opened_at is None:
+                        logger.warning("Backend circuit breaker opened after %d failures", self._failures)
+                    self._opened_at = time.time()
+                if trial:
+                    self._trial_in_flight = False
+            raise
+        except BaseException:
+            # Anything else (bugs, gevent timeouts, worker shutdown) isn't a backend failure, but a
+            # trial that didn't succeed must still give up its slot and reopen the circuit
+            if trial:
+                with self._lock:
+                    self._opened_at = time.time()
+                    self._trial_in_flight = False
+            raise
+        
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info("Backend circuit breaker closed")
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+        return result
+
+BACKEND_BREAKER = CircuitBreaker(fail_max=5, reset_timeout=30)
+
 # Configure CORS properly
 CORS(app, resources={
     r"/api/*": {
@@ -64,370 +266,695 @@ CORS(app, resources={
             FRONTEND_URL
         ],
         "methods": ["GET", "POST", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization", "Accept"],
+        "allow_headers": ["Content-Type", "Authorization", "Accept", "Idempotency-Key"],
         "supports_credentials": True,
-        "expose_headers": ["Content-Type", "Authorization"]
+        "expose_headers": ["Content-Type", "Authorization", "Retry-After"],
+        # Let browsers reuse a preflight for 10 minutes instead of sending OPTIONS before every JSON POST
+        "max_age": 600
     }
 })
 
 # Configuration from environment
 app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'your-jwt-secret-key')
+# Werkzeug rejects larger bodies before reading them; 64 KB is plenty for booking/email payloads
+app.config['MAX_CONTENT_LENGTH'] = 64 * 1024
+# Let unhandled errors reach the WSGI server's logging instead of being swallowed into a bare 500 page
+app.config['PROPAGATE_EXCEPTIONS'] = True
+
+@app.before_request
+def reject_oversized_body():
+    # Check the declared length up front so views' broad except blocks never see the 413
+    if request.content_length is not None and request.content_length > app.config['MAX_CONTENT_LENGTH']:
+        abort(413)
+
+@app.errorhandler(413)
+def payload_too_large(e):
+    return jsonify({'error': 'payload too large'}), 413
 
 # Initialize extensions
 jwt = JWTManager(app)
+
+def rate_limit_key():
+    """Rate-limit signed-in users by their token identity, everyone else by remote address."""
+    if 'rate_limit_key' in g:
+        return g.rate_limit_key
+    try:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+    except Exception:
+        # Malformed or expired tokens fall back to the address rather than failing the request here
+        identity = None
+    g.rate_limit_key = f"user:{identity}" if identity else get_remote_address()
+    return g.rate_limit_key
+
+# (endpoint, rate limit key) -> time the breached window resets; lets repeat offenders
+# be turned away without another round trip to the limiter storage
+_RATE_LIMITED = {}
+_RATE_LIMITED_SIZE = 10000
+
+def remember_breach(request_limit):
+    now = time.time()
+    if len(_RATE_LIMITED) >= _RATE_LIMITED_SIZE:
+        for key in [key for key, reset_at in _RATE_LIMITED.items() if reset_at <= now]:
+            _RATE_LIMITED.pop(key, None)
+        if len(_RATE_LIMITED) >= _RATE_LIMITED_SIZE:
+            _RATE_LIMITED.clear()
+    _RATE_LIMITED[(request.endpoint, rate_limit_key())] = request_limit.reset_at
+
+def rate_limited_response(retry_after):
+    response = make_response(jsonify({'error': 'rate limit exceeded'}), 429)
+    response.headers['Retry-After'] = str(max(int(retry_after), 1))
+    return response
+
+# Registered before the Limiter so it runs ahead of the limiter's own storage check
+@app.before_request
+def reject_known_offenders():
+    key = (request.endpoint, rate_limit_key())
+    reset_at = _RATE_LIMITED.get(key)
+    if reset_at is None:
+        return None
+    remaining = reset_at - time.time()
+    if remaining > 0:
+        return rate_limited_response(remaining)
+    _RATE_LIMITED.pop(key, None)
+    return None
+
+@app.errorhandler(429)
+def too_many_requests(e):
+    reset_at = _RATE_LIMITED.get((request.endpoint, rate_limit_key()), time.time())
+    return rate_limited_response(reset_at - time.time())
+
+# Counters live in RATELIMIT_STORAGE_URL; point it at redis://... so all workers share one window
 limiter = Limiter(
     app=app,
-    key_func=get_remote_address,
-    default_limits=["200 per day", "50 per hour"]
+    key_func=rate_limit_key,
+    storage_uri=os.getenv('RATELIMIT_STORAGE_URL', 'memory://'),
+    strategy=os.getenv('RATELIMIT_STRATEGY', 'moving-window'),
+    default_limits=["200 per day", "50 per hour"],
+    on_breach=remember_breach
 )
 
 # Chat endpoint with rate limiting
+# Everything after the echoed message is fixed, so it is encoded once
+_CHAT_TAIL = b',"intent":"booking","next_action":"show_calendar"}'
+
 @app.route('/api/chat/message', methods=['POST'])
 @limiter.limit("10 per minute")
 def handle_chat():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Request body must be a JSON object'}), 400
+    # Process chat message and determine intent
+    # This is a simple example - you would typically use a more sophisticated NLP service
+    body = b'{"message":' + orjson.dumps(f"Received: {data.get('message', '')}") + _CHAT_TAIL
+    return Response(body, mimetype='application/json')
+
+def backend_request(method, url, **kwargs):
+    """Call the backend through the shared session, encoding any json= body with orjson.
+    
+    Waits up to BACKEND_POOL_TIMEOUT for a free slot and raises BackendBusyError if none frees up.
+    """
+    payload = kwargs.pop('json', None)
+    if payload is not None:
+        kwargs['data'] = orjson.dumps(payload)
+        kwargs['headers'] = {**(kwargs.get('headers') or {}), 'Content-Type': 'application/json'}
+    kwargs.setdefault('timeout', BACKEND_TIMEOUT)
+    # Waiting for a slot happens outside the breaker: a busy gateway isn't a failing backend
+    if not BACKEND_SLOTS.acquire(timeout=BACKEND_POOL_TIMEOUT):
+        raise BackendBusyError('No backend connection free')
     try:
-        message = request.json.get('message')
-        # Process chat message and determine intent
-        # This is a simple example - you would typically use a more sophisticated NLP service
-        response = {
-            'message': f"Received: {message}",
-            'intent': 'booking',  # Simplified intent detection
-            'next_action': 'show_calendar'
-        }
-        return jsonify(response)
-    except Exception as e:
-        return jsonify({'error': str(e)}), 400
+        response = BACKEND_BREAKER.call(SESSION.request, method, url, **kwargs)
+    except BaseException:
+        BACKEND_SLOTS.release()
+        raise
+    if kwargs.get('stream'):
+        # A streamed body still holds its connection; release_backend_response() gives the slot back
+        response.holds_backend_slot = True
+    else:
+        BACKEND_SLOTS.release()
+    return response
+
+def release_backend_response(response):
+    """Close a backend response and free its slot if it still holds one; safe to call twice."""
+    holds_slot = response.__dict__.pop('holds_backend_slot', False)
+    response.close()
+    if holds_slot:
+        BACKEND_SLOTS.release()
+
+def proxy(method, url, **kwargs):
+    """Forward a request to the backend and relay its response, mapping connection failures to 503/504."""
+    try:
+        response = backend_request(method, url, **kwargs)
+    except requests.RequestException as e:
+        body, status = backend_failure(e)
+        return make_response(jsonify(body), status)
+    return relay_response(response, stream=kwargs.get('stream', False))
 
 # Booking endpoints
+AVAILABILITY_MAX_AGE = 10  # seconds clients may reuse a day's availability
+
 @app.route('/api/bookings/availability/<date>', methods=['GET'])
 def check_availability(date):
+    response = proxy('GET', AVAILABILITY_URL + date)
+    if response.status_code != 200:
+        return response
+    return cacheable_response(response, content_etag(response.get_data()), AVAILABILITY_MAX_AGE)
+
+MAX_BATCH_DATES = 31
+AVAILABILITY_POOL = ThreadPoolExecutor(max_workers=16)
+# Deadline for the whole fan-out, so one slow date can't hold the batch for the full retried read timeout
+AVAILABILITY_BATCH_TIMEOUT = 10  # seconds
+
+def fetch_availability(date):
+    """Fetch one date's availability from the backend; returns (body, status)."""
+    response = backend_request('GET', AVAILABILITY_URL + date)
+    return orjson.loads(response.content), response.status_code
+
+@app.route('/api/bookings/availability/batch', methods=['POST'])
+def check_availability_batch():
+    """Fetch availability for several dates concurrently and return them keyed by date."""
+    data = request.get_json(silent=True) or {}
+    dates = data.get('dates')
+    if not isinstance(dates, list) or not dates or not all(isinstance(date, str) for date in dates):
+        return jsonify({'error': 'dates must be a non-empty list of date strings'}), 400
+    if len(dates) > MAX_BATCH_DATES:
+        return jsonify({'error': f'At most {MAX_BATCH_DATES} dates per request'}), 400
+    
+    futures = {AVAILABILITY_POOL.submit(fetch_availability, date): date for date in set(dates)}
+    result = {}
+    try:
+        for future in as_completed(futures, timeout=AVAILABILITY_BATCH_TIMEOUT):
+            date = futures[future]
+            try:
+                body, status = future.result()
+                if status == 200:
+                    result[date] = body
+                else:
+                    error = body.get('error') if isinstance(body, dict) else None
+                    result[date] = {'error': error or f'Backend error: {status}'}
+            except requests.RequestException as e:
+                result[date] = backend_failure(e)[0]
+            except ValueError:
+                result[date] = {'error': 'Invalid JSON response from backend'}
+    except FuturesTimeout:
+        for future, date in futures.items():
+            if date not in result:
+                future.cancel()
+                result[date] = {'error': 'Backend service timeout'}
+    return jsonify(result)
+
+BOOKING_REQUIRED_FIELDS = frozenset({'date', 'nationality', 'adults', 'ticketType', 'timeSlot', 'email'})
+
+def forward_booking(data):
+    """Validate a booking payload and create it on the backend; returns (body, status)."""
+    if not data or not isinstance(data, dict):
+        logger.warning("Booking request without data")
+        return {'error': 'No data provided'}, 400
+        
+    # Required fields are the ones not set to a non-empty value; children is optional and defaults to 0
+    data.setdefault('children', 0)
+    missing_fields = BOOKING_REQUIRED_FIELDS - {field for field, value in data.items() if value not in (None, '')}
+    
+    if missing_fields:
+        error_msg = f'Missing required fields: {", ".join(sorted(missing_fields))}'
+        logger.warning("Booking request rejected: %s", error_msg)
+        return {'error': error_msg}, 400
+        
+    # Forward request to backend
     try:
-        response = requests.get(f"{BACKEND_URL}/api/bookings/availability/{date}")
-        return jsonify(response.json()), response.status_code
+        logger.debug("Forwarding booking to backend: %s", data)
+        response = backend_request('POST', BOOKING_CREATE_URL, json=data)
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Backend booking response %s: %s", response.status_code, response.text)
+        
+        if not response.ok:
+            error_msg = backend_error_message(response, 'Booking creation failed')
+            logger.warning("Backend rejected booking with %s: %s", response.status_code, error_msg)
+            return {'error': error_msg}, response.status_code
+        
+        # Process successful response
+        try:
+            booking_data = orjson.loads(response.content)
+            
+            # Ensure booking_id is present
+            if 'success' in booking_data and booking_data['success']:
+                if 'booking_id' not in booking_data:
+                    booking_data['booking_id'] = booking_data.get('id')
+                
+            logger.info("Booking %s created", booking_data.get('booking_id'))
+            return booking_data, 200
+            
+        except ValueError as e:
+            logger.error("Invalid JSON in backend booking response: %s", e)
+            return {'error': 'Invalid JSON response from backend'}, 500
+            
     except requests.RequestException as e:
-        return jsonify({'error': 'Backend service unavailable'}), 503
+        logger.error("Backend booking request failed: %s", e)
+        return backend_failure(e)
+
+# Responses keyed by (caller, path, Idempotency-Key): (stored_at, body_hash, body, status);
+# in-flight keys map to (Event, body_hash)
+_IDEMPOTENT_RESPONSES = {}
+_IDEMPOTENT_PENDING = {}
+_IDEMPOTENCY_LOCK = threading.Lock()
+_IDEMPOTENCY_TTL = 24 * 60 * 60  # seconds
+_IDEMPOTENCY_WAIT = 15  # seconds a duplicate waits for the first request to finish
+_IDEMPOTENCY_CACHE_SIZE = 4096
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+
+def store_idempotent_response(key, body_hash, body, status):
+    now = time.time()
+    with _IDEMPOTENCY_LOCK:
+        if len(_IDEMPOTENT_RESPONSES) >= _IDEMPOTENCY_CACHE_SIZE:
+            for stale in [k for k, entry in _IDEMPOTENT_RESPONSES.items() if now - entry[0] > _IDEMPOTENCY_TTL]:
+                del _IDEMPOTENT_RESPONSES[stale]
+            while len(_IDEMPOTENT_RESPONSES) >= _IDEMPOTENCY_CACHE_SIZE:
+                del _IDEMPOTENT_RESPONSES[next(iter(_IDEMPOTENT_RESPONSES))]
+        _IDEMPOTENT_RESPONSES[key] = (now, body_hash, body, status)
+
+def idempotency_conflict():
+    return jsonify({'error': 'Idempotency-Key was already used with a different request body'}), 422
+
+def idempotent_response(key, body_hash):
+    """Return the stored response for an Idempotency-Key, or None if there isn't a fresh one.
+    
+    A stored response for a different request body is answered with a 422 instead of replayed.
+    """
+    entry = _IDEMPOTENT_RESPONSES.get(key)
+    if entry is None or time.time() - entry[0] > _IDEMPOTENCY_TTL:
+        return None
+    if entry[1] != body_hash:
+        return idempotency_conflict()
+    response = Response(entry[2], status=entry[3], mimetype='application/json')
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+def idempotent(view):
+    """Replay the first response for a repeated Idempotency-Key instead of running the view again.
+    
+    Keys are scoped to the caller (see rate_limit_key), so one client can't replay another's
+    response, and reusing a key with a different body is rejected with a 422.
+    A duplicate arriving while the first request is still running waits for its result.
+    Server errors aren't stored, so a retry after a 5xx is forwarded again.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        idem = request.headers.get('Idempotency-Key')
+        if not idem:
+            return view(*args, **kwargs)
+        if len(idem) > MAX_IDEMPOTENCY_KEY_LENGTH:
+            return jsonify({'error': 'Idempotency-Key too long'}), 400
+        key = (rate_limit_key(), request.path, idem)
+        body_hash = content_etag(request.get_data())
+        
+        with _IDEMPOTENCY_LOCK:
+            replay = idempotent_response(key, body_hash)
+            in_flight = _IDEMPOTENT_PENDING.get(key)
+            if replay is None and in_flight is None:
+                done = threading.Event()
+                _IDEMPOTENT_PENDING[key] = (done, body_hash)
+        if replay is not None:
+            return replay
+        if in_flight is not None:
+            if in_flight[1] != body_hash:
+                return idempotency_conflict()
+            in_flight[0].wait(_IDEMPOTENCY_WAIT)
+            return idempotent_response(key, body_hash) or (
+                jsonify({'error': 'A request with this Idempotency-Key is still in progress'}), 409)
+        
+        try:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code < 500:
+                store_idempotent_response(key, body_hash, response.get_data(), response.status_code)
+            return response
+        finally:
+            with _IDEMPOTENCY_LOCK:
+                del _IDEMPOTENT_PENDING[key]
+            done.set()
+    return wrapper
 
 @app.route('/api/bookings/create', methods=['POST'])
+@idempotent
 def create_booking():
     try:
-        print("\n=== Gateway: Booking Creation Started ===")
-        print("Gateway: Received booking data:", request.json)
-        
-        # Validate input data
-        data = request.json
-        if not data:
-            print("Gateway: No data provided")
-            return jsonify({'error': 'No data provided'}), 400
+        body, status = forward_booking(request.get_json(silent=True))
+        return jsonify(body), status
             
-        # Validate required fields
-        required_fields = ['date', 'nationality', 'adults', 'ticketType', 'timeSlot', 'email']
-        missing_fields = [field for field in required_fields if field not in data or data[field] is None or data[field] == '']
+    except Exception as e:
+        logger.exception("Unexpected error creating booking")
+        return jsonify({'error': f'Unexpected error: {str(e)}'}), 500
+
+@app.route('/api/bookings/create_and_notify', methods=['POST'])
+@idempotent
+def create_and_notify():
+    """Create a booking and send its confirmation email in one round trip."""
+    try:
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Request body must be a JSON object'}), 400
         
-        if missing_fields:
-            error_msg = f'Missing required fields: {", ".join(missing_fields)}'
-            print(f"Gateway: {error_msg}")
-            return jsonify({'error': error_msg}), 400
-            
-        # Forward request to backend
-        try:
-            print("Gateway: Forwarding request to backend")
-            response = requests.post(
-                f"{BACKEND_URL}/api/bookings/create",
-                json=data,
-                headers={'Content-Type': 'application/json'},
-                timeout=15
+        email = data.get('email') or {}
+        if not isinstance(email, dict):
+            return jsonify({'error': 'email must be an object'}), 400
+        booking_details = email.get('booking_details') or {}
+        if not isinstance(booking_details, dict):
+            return jsonify({'error': 'booking_details must be an object'}), 400
+        if booking_details:
+            valid, error_msg = validate_booking_details(booking_details)
+            if not valid:
+                return jsonify({'error': error_msg}), 400
+        
+        booking_data, status = forward_booking(data.get('booking'))
+        if status != 200:
+            return jsonify(booking_data), status
+        
+        booking_details = dict(booking_details)
+        booking_details['amount'] = booking_data.get('amount', 0)
+        
+        # Send the email in the background so the booking response doesn't wait on SMTP
+        if SMTP_CONFIG_ERROR:
+            booking_data['email_status'] = 'disabled'
+        else:
+            queued = queue_booking_email(
+                email.get('to_email') or data['booking'].get('email'),
+                booking_data.get('booking_id'),
+                booking_details
             )
+            booking_data['email_status'] = 'queued' if queued else 'failed'
             
-            print(f"Gateway: Backend response status: {response.status_code}")
-            print(f"Gateway: Backend response: {response.text}")
-            
-            if not response.ok:
-                error_msg = 'Booking creation failed'
-                try:
-                    error_data = response.json()
-                    if 'error' in error_data:
-                        error_msg = error_data['error']
-                except:
-                    pass
-                print(f"Gateway: Backend error - {error_msg}")
-                return jsonify({'error': error_msg}), response.status_code
-            
-            # Process successful response
-            try:
-                booking_data = response.json()
-                
-                # Ensure booking_id is present
-                if 'success' in booking_data and booking_data['success']:
-                    if 'booking_id' not in booking_data:
-                        booking_data['booking_id'] = booking_data.get('id')
-                    
-                print("Gateway: Booking created successfully:", booking_data)
-                return jsonify(booking_data), 200
-                
-            except ValueError as e:
-                print(f"Gateway: JSON parsing error - {str(e)}")
-                return jsonify({'error': 'Invalid JSON response from backend'}), 500
-                
-        except requests.Timeout:
-            print("Gateway: Backend request timeout")
-            return jsonify({'error': 'Backend service timeout'}), 504
-        except requests.RequestException as e:
-            print(f"Gateway: Request error - {str(e)}")
-            return jsonify({'error': f'Backend service unavailable: {str(e)}'}), 503
-            
+        return jsonify(booking_data), 200
+        
     except Exception as e:
-        print(f"Gateway: Unexpected error - {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Unexpected error creating booking with notification")
         return jsonify({'error': f'Unexpected error: {str(e)}'}), 500
 
 @app.route('/api/bookings/<booking_id>', methods=['GET'])
 def get_booking(booking_id):
-    try:
-        response = requests.get(f"{BACKEND_URL}/api/bookings/{booking_id}")
-        return jsonify(response.json()), response.status_code
-    except requests.RequestException as e:
-        return jsonify({'error': 'Backend service unavailable'}), 503
+    return proxy('GET', BOOKINGS_URL + booking_id)
 
 # Calendar endpoints
-@app.route('/api/calendar/monthly/<year>/<month>', methods=['GET'])
+@app.route('/api/calendar/monthly/<int:year>/<int:month>', methods=['GET'])
 def get_calendar(year, month):
+    """Relay a month from the backend, passing If-None-Match through so an unchanged month is a 304.
+    
+    The backend owns the calendar cache and drops a month when it is booked, so nothing is cached here.
+    """
+    logger.debug("Fetching calendar for %s/%s", year, month)
+    etag = request.headers.get('If-None-Match')
     try:
-        print(f"Gateway: Fetching calendar for {year}/{month}")  # Debug log
-        
-        # Add timeout to prevent hanging
-        response = requests.get(
-            f"{BACKEND_URL}/api/calendar/monthly/{year}/{month}",
-            headers={'Content-Type': 'application/json'},
-            timeout=10  # Add 10 second timeout
-        )
-        
-        # Handle non-200 responses
-        if not response.ok:
-            error_msg = f"Backend error: {response.status_code}"
-            try:
-                error_data = response.json()
-                if 'error' in error_data:
-                    error_msg = error_data['error']
-            except:
-                pass
-            print(f"Gateway: Backend error - {error_msg}")  # Debug log
-            return jsonify({'error': error_msg}), response.status_code
-            
-        # Validate and process response
-        try:
-            calendar_data = response.json()
-            
-            # Validate calendar data structure
-            if not isinstance(calendar_data, dict):
-                print("Gateway: Invalid calendar data format")  # Debug log
-                return jsonify({'error': 'Invalid calendar data format'}), 500
-                
-            # Log success
-            print(f"Gateway: Successfully fetched calendar data for {year}/{month}")
-            return jsonify(calendar_data), 200
-            
-        except ValueError as e:
-            print(f"Gateway: JSON parsing error - {str(e)}")  # Debug log
-            return jsonify({'error': 'Invalid JSON response from backend'}), 500
-            
-    except requests.Timeout:
-        print("Gateway: Backend request timeout")  # Debug log
-        return jsonify({'error': 'Backend service timeout'}), 504
+        response = backend_request('GET', f"{CALENDAR_URL}{year}/{month}",
+                                   headers={'If-None-Match': etag} if etag else None, timeout=(3, 10))
     except requests.RequestException as e:
-        print(f"Gateway: Request error - {str(e)}")  # Debug log
-        return jsonify({'error': f'Backend service unavailable: {str(e)}'}), 503
-    except Exception as e:
-        print(f"Gateway: Unexpected error - {str(e)}")  # Debug log
-        return jsonify({'error': f'Unexpected error: {str(e)}'}), 500
+        logger.error("Backend calendar request failed: %s", e)
+        body, status = backend_failure(e)
+        return jsonify(body), status
+    
+    if response.status_code not in (200, 304):
+        logger.warning("Backend returned %s for calendar %s/%s: %s",
+                       response.status_code, year, month, backend_error_message(response))
+    relay = relay_response(response)
+    for header in ('ETag', 'Cache-Control'):
+        if header in response.headers:
+            relay.headers[header] = response.headers[header]
+    return relay
+
+@app.route('/api/calendar/monthly_batch', methods=['POST'])
+def get_calendar_batch():
+    """Fetch several months from the backend in one request."""
+    return proxy('POST', CALENDAR_BATCH_URL, json=request.get_json(silent=True) or {}, timeout=(3, 10))
 
 # Payment endpoints
 @app.route('/api/payments/initialize', methods=['POST'])
 def initialize_payment():
-    try:
-        response = requests.post(
-            f"{BACKEND_URL}/api/payments/initialize",
-            json=request.json
-        )
-        return jsonify(response.json()), response.status_code
-    except requests.RequestException as e:
-        return jsonify({'error': 'Backend service unavailable'}), 503
+    return proxy('POST', PAYMENT_INIT_URL, json=request.get_json(silent=True))
 
 @app.route('/api/payments/<payment_id>/status', methods=['GET'])
 def get_payment_status(payment_id):
-    try:
-        response = requests.get(
-            f"{BACKEND_URL}/api/payments/{payment_id}/status"
-        )
-        return jsonify(response.json()), response.status_code
-    except requests.RequestException as e:
-        return jsonify({'error': 'Backend service unavailable'}), 503
-
-# Email endpoint
-@app.route('/api/email/send', methods=['POST'])
-def send_email():
-    try:
-        print("\n=== Email Request Started ===")
-        print("Gateway: Received email request")
-        print("Request Headers:", dict(request.headers))
-        print("Raw request data:", request.get_data())
-        
-        # Check if we have JSON data
-        if not request.is_json:
-            error_msg = "No JSON data received"
-            print(f"Error: {error_msg}")
-            return jsonify({'error': error_msg}), 400
-            
-        data = request.json
-        print("\nParsed JSON data:", data)
-        
-        to_email = data.get('to_email')
-        booking_id = data.get('booking_id')
-        booking_details = data.get('booking_details', {})
+    return proxy('GET', PAYMENT_STATUS_URL % payment_id)
 
-        print(f"\nExtracted data:")
-        print(f"- To Email: {to_email}")
-        print(f"- Booking ID: {booking_id}")
-        print(f"- Booking Details:", booking_details)
-
-        # Validate required fields with detailed logging
-        missing = []
-        if not to_email: 
-            missing.append('to_email')
-            print("Missing to_email")
-        if not booking_id: 
-            missing.append('booking_id')
-            print("Missing booking_id")
-        if not booking_details: 
-            missing.append('booking_details')
-            print("Missing booking_details")
-        if missing:
-            error_msg = f'Missing required fields: {", ".join(missing)}'
-            print(f"Validation Error: {error_msg}")
-            return jsonify({'error': error_msg}), 400
-
-        # Validate email configuration
-        print("\nSMTP Configuration:")
-        print(f"- Server: {SMTP_SERVER}")
-        print(f"- Port: {SMTP_PORT}")
-        print(f"- Username: {SMTP_USERNAME}")
-        print(f"- Password: {'*' * len(SMTP_PASSWORD) if SMTP_PASSWORD else 'Not Set'}")
-        print(f"- Sender: {SENDER_EMAIL}")
+class SMTPPool:
+    """Keeps logged-in SMTP connections open so each email skips the connect/TLS/login round trips."""
+    
+    IDLE_CHECK_SECONDS = 30
+    
+    def __init__(self, size=4):
+        self.size = size
+        self._idle = queue.LifoQueue(maxsize=size)
+    
+    def _connect(self):
+        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=30)
+        server.starttls()
+        server.login(SMTP_USERNAME, SMTP_PASSWORD)
+        return server
+    
+    @staticmethod
+    def _close(server):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+    
+    def _is_alive(self, server):
+        try:
+            return server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            self._close(server)
+            return False
+    
+    @contextmanager
+    def acquire(self):
+        """Yield a ready connection; it goes back to the pool unless the caller raised."""
+        try:
+            server, last_used = self._idle.get_nowait()
+            # The server may have timed out a connection that sat idle for a while
+            if time.time() - last_used > self.IDLE_CHECK_SECONDS and not self._is_alive(server):
+                server = self._connect()
+        except queue.Empty:
+            server = self._connect()
         
-        missing_config = []
-        if not SMTP_SERVER: missing_config.append('SMTP_SERVER')
-        if not SMTP_PORT: missing_config.append('SMTP_PORT')
-        if not SMTP_USERNAME: missing_config.append('SMTP_USERNAME')
-        if not SMTP_PASSWORD: missing_config.append('SMTP_PASSWORD')
-        if not SENDER_EMAIL: missing_config.append('SENDER_EMAIL')
+        try:
+            yield server
+        except Exception:
+            self._close(server)
+            raise
         
-        if missing_config:
-            error_msg = f"Missing SMTP configuration: {', '.join(missing_config)}"
-            print(f"Configuration Error: {error_msg}")
-            return jsonify({'error': error_msg}), 500
-
-        # Create email message
         try:
-            print("\nCreating email message...")
-            msg = MIMEMultipart()
-            msg['From'] = SENDER_EMAIL
-            msg['To'] = to_email
-            msg['Subject'] = 'Museum Booking Confirmation'
-
-            # Create email body
-            body = f"""
+            self._idle.put_nowait((server, time.time()))
+        except queue.Full:
+            self._close(server)
+    
+    def close_all(self):
+        """QUIT every idle connection, e.g. at shutdown."""
+        while True:
+            try:
+                server, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(server)
+
+SMTP_POOL = SMTPPool(size=int(os.getenv('SMTP_POOL_SIZE', 4)))
+atexit.register(SMTP_POOL.close_all)
+
+# Longest value accepted for each free-text booking_details field that ends up in the email body
+BOOKING_DETAILS_MAX_LENGTHS = {'date': 10, 'timeSlot': 50}
+# Fields that must be numbers (or numeric strings); their length isn't capped, so 36.900000000000006 is fine
+BOOKING_DETAILS_NUMERIC_FIELDS = ('adults', 'children', 'amount')
+BOOKING_DETAILS_MAX_FIELDS = 32
+
+def is_number(value):
+    """True for ints, floats and short numeric strings; bools don't count."""
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, (int, float)):
+        return True
+    if isinstance(value, str) and len(value) <= 32:
+        try:
+            float(value)
+            return True
+        except ValueError:
+            return False
+    return False
+
+def validate_booking_details(booking_details):
+    """Check booking_details before it is rendered into an email; returns (valid, error message)."""
+    valid, error_msg = validate_request_data(booking_details, (), BOOKING_DETAILS_MAX_LENGTHS, BOOKING_DETAILS_MAX_FIELDS)
+    if not valid:
+        return valid, error_msg
+    not_numbers = [field for field in BOOKING_DETAILS_NUMERIC_FIELDS
+                   if booking_details.get(field) is not None and not is_number(booking_details[field])]
+    if not_numbers:
+        return False, f'Fields must be numbers: {", ".join(not_numbers)}'
+    return True, None
+
+BOOKING_EMAIL_SUBJECT = 'Museum Booking Confirmation'
+BOOKING_EMAIL_BODY = Template("""
 Dear Visitor,
 
 Thank you for booking with us! Your booking has been confirmed.
 
 Booking Details:
 ----------------
-Booking ID: {booking_id}
-Date: {booking_details.get('date')}
-Time Slot: {booking_details.get('timeSlot')}
+Booking ID: $booking_id
+Date: $date
+Time Slot: $time_slot
 Number of Visitors:
-- Adults: {booking_details.get('adults')}
-- Children: {booking_details.get('children')}
-Total Amount: ₹{booking_details.get('amount')}
+- Adults: $adults
+- Children: $children
+Total Amount: ₹$amount
 
 Please keep this booking ID for future reference.
 We look forward to your visit!
 
 Best regards,
 Museum Management Team
-"""
-            print("\nEmail Content Preview:")
-            print("- From:", SENDER_EMAIL)
-            print("- To:", to_email)
-            print("- Subject: Museum Booking Confirmation")
-            print("- Body Preview:", body[:100] + "...")
+""")
 
-            msg.attach(MIMEText(body, 'plain'))
+def deliver_booking_email(to_email, booking_id, booking_details):
+    """Build and send a booking confirmation email; returns (body, status)."""
+    if SMTP_CONFIG_ERROR:
+        logger.error(SMTP_CONFIG_ERROR)
+        return {'error': SMTP_CONFIG_ERROR}, 500
 
-        except Exception as e:
-            error_msg = f"Error creating email message: {str(e)}"
-            print(f"Message Creation Error: {error_msg}")
-            print(traceback.format_exc())
-            return jsonify({'error': error_msg}), 500
+    # Create email message
+    try:
+        msg = EmailMessage()
+        msg['From'] = SENDER_EMAIL
+        msg['To'] = to_email
+        msg['Subject'] = BOOKING_EMAIL_SUBJECT
+        msg.set_content(BOOKING_EMAIL_BODY.substitute(
+            booking_id=booking_id,
+            date=booking_details.get('date'),
+            time_slot=booking_details.get('timeSlot'),
+            adults=booking_details.get('adults'),
+            children=booking_details.get('children'),
+            amount=booking_details.get('amount')
+        ))
 
-        # Send email with retries
-        max_retries = 3
-        retry_count = 0
-        last_error = None
+    except Exception as e:
+        error_msg = f"Error creating email message: {str(e)}"
+        logger.exception("Error creating confirmation email for booking %s", booking_id)
+        return {'error': error_msg}, 500
 
-        while retry_count < max_retries:
-            try:
-                print(f"\n=== SMTP Connection Attempt {retry_count + 1}/{max_retries} ===")
-                
-                print("1. Creating SMTP connection...")
-                server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-                server.set_debuglevel(2)  # Enable debug output
-                
-                print("\n2. Starting TLS...")
-                server.starttls()
-                
-                print("\n3. Attempting login...")
-                server.login(SMTP_USERNAME, SMTP_PASSWORD)
-                
-                print("\n4. Sending email...")
+    # Send email with retries
+    max_retries = 3
+    retry_count = 0
+    last_error = None
+
+    while retry_count < max_retries:
+        try:
+            with SMTP_POOL.acquire() as server:
                 server.send_message(msg)
-                
-                print("\n5. Closing SMTP connection...")
-                server.quit()
-                
-                print("\nEmail sent successfully!")
-                return jsonify({'message': 'Email sent successfully', 'to': to_email}), 200
-                
-            except smtplib.SMTPAuthenticationError as auth_error:
-                error_msg = f"SMTP Authentication failed: {str(auth_error)}"
-                print(f"Authentication Error: {error_msg}")
-                print(traceback.format_exc())
-                return jsonify({'error': error_msg}), 500
-                
-            except (smtplib.SMTPException, ConnectionError) as smtp_error:
-                last_error = smtp_error
-                retry_count += 1
-                print(f"SMTP Error on attempt {retry_count}: {str(smtp_error)}")
-                if retry_count < max_retries:
-                    wait_time = retry_count * 2
-                    print(f"Retrying in {wait_time} seconds...")
-                    time.sleep(wait_time)
-                continue
-                
-            except Exception as e:
-                error_msg = f"Unexpected error sending email: {str(e)}"
-                print(f"Unexpected Error: {error_msg}")
-                print(traceback.format_exc())
-                return jsonify({'error': error_msg}), 500
-
-        # If we've exhausted all retries
-        error_msg = f"Failed to send email after {max_retries} attempts. Last error: {str(last_error)}"
-        print(f"Final Error: {error_msg}")
-        return jsonify({'error': error_msg}), 500
+            
+            logger.info("Confirmation email for booking %s sent to %s", booking_id, to_email)
+            return {'message': 'Email sent successfully', 'to': to_email}, 200
+            
+        except smtplib.SMTPAuthenticationError as auth_error:
+            error_msg = f"SMTP Authentication failed: {str(auth_error)}"
+            logger.error(error_msg)
+            return {'error': error_msg}, 500
+            
+        except smtplib.SMTPServerDisconnected as disconnected:
+            # A pooled connection was dropped by the server; retry straight away on a fresh one
+            last_error = disconnected
+            retry_count += 1
+            logger.warning("SMTP connection lost on attempt %s: %s", retry_count, disconnected)
+            continue
+            
+        except (smtplib.SMTPException, ConnectionError) as smtp_error:
+            last_error = smtp_error
+            retry_count += 1
+            logger.warning("SMTP error on attempt %s: %s", retry_count, smtp_error)
+            if retry_count < max_retries:
+                wait_time = retry_count * 2
+                time.sleep(wait_time)
+            continue
+            
+        except Exception as e:
+            error_msg = f"Unexpected error sending email: {str(e)}"
+            logger.exception("Unexpected error sending email for booking %s", booking_id)
+            return {'error': error_msg}, 500
+
+    # If we've exhausted all retries
+    error_msg = f"Failed to send email after {max_retries} attempts. Last error: {str(last_error)}"
+    logger.error(error_msg)
+    return {'error': error_msg}, 500
+
+# Background pool for confirmation emails sent on behalf of other requests
+# One worker per pooled SMTP connection, so concurrent sends never open throwaway connections
+EMAIL_POOL = ThreadPoolExecutor(max_workers=SMTP_POOL.size)
+
+# Emails waiting or in flight; beyond this the queue is refused rather than growing without bound
+EMAIL_BACKLOG = threading.BoundedSemaphore(int(os.getenv('EMAIL_QUEUE_SIZE', 256)))
+
+def send_email_async(to_email, booking_id, booking_details):
+    """Deliver a confirmation email off the request thread, logging the outcome."""
+    try:
+        body, status = deliver_booking_email(to_email, booking_id, booking_details)
+        if status != 200:
+            log_error('Email', f"Failed to send confirmation for booking {booking_id}: {body.get('error')}")
+    except Exception as e:
+        log_error('Email', f"Error sending confirmation for booking {booking_id}: {str(e)}")
+    finally:
+        EMAIL_BACKLOG.release()
+
+def queue_booking_email(to_email, booking_id, booking_details):
+    """Hand a confirmation email to EMAIL_POOL; returns False if the backlog is full."""
+    if not EMAIL_BACKLOG.acquire(blocking=False):
+        log_error('Email', f"Email backlog full, not queueing confirmation for booking {booking_id}")
+        return False
+    EMAIL_POOL.submit(send_email_async, to_email, booking_id, booking_details)
+    return True
+
+# Email endpoint
+EMAIL_REQUIRED_FIELDS = frozenset({'to_email', 'booking_id', 'booking_details'})
+
+@app.route('/api/email/send', methods=['POST'])
+def send_email():
+    try:
+        # Check if we have JSON data
+        if not request.is_json:
+            error_msg = "No JSON data received"
+            logger.warning("Email request rejected: %s", error_msg)
+            return jsonify({'error': error_msg}), 400
+            
+        data = request.json
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Request body must be a JSON object'}), 400
+        
+        to_email = data.get('to_email')
+        booking_id = data.get('booking_id')
+        booking_details = data.get('booking_details', {})
+        logger.debug("Email request for booking %s to %s: %s", booking_id, to_email, booking_details)
+
+        # Validate required fields
+        missing = EMAIL_REQUIRED_FIELDS - {field for field, value in data.items() if value}
+        if missing:
+            error_msg = f'Missing required fields: {", ".join(sorted(missing))}'
+            logger.warning("Email request rejected: %s", error_msg)
+            return jsonify({'error': error_msg}), 400
+        if not isinstance(booking_details, dict):
+            return jsonify({'error': 'booking_details must be an object'}), 400
+        valid, error_msg = validate_booking_details(booking_details)
+        if not valid:
+            logger.warning("Email request rejected: %s", error_msg)
+            return jsonify({'error': error_msg}), 400
+
+        # Fail fast on configuration problems; everything else is reported by the background send
+        if SMTP_CONFIG_ERROR:
+            logger.error(SMTP_CONFIG_ERROR)
+            return jsonify({'error': SMTP_CONFIG_ERROR}), 500
+        
+        if not queue_booking_email(to_email, booking_id, booking_details):
+            return jsonify({'error': 'Email queue is full, try again later'}), 503
+        return jsonify({'status': 'queued', 'message': 'Email queued', 'to': to_email}), 202
 
     except Exception as e:
         error_msg = f"Email processing error: {str(e)}"
-        print(f"Processing Error: {error_msg}")
-        print(traceback.format_exc())
+        logger.exception("Email processing error")
         return jsonify({'error': error_msg}), 500
 
 # User session management
@@ -440,45 +967,14 @@ def create_session():
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
-# Add CORS headers to handle OPTIONS requests
-@app.after_request
-def after_request(response):
-    # Allow specific origins
-    allowed_origins = [
-        "http://localhost:5003",
-        "http://127.0.0.1:5003",
-        FRONTEND_URL
-    ]
-    origin = request.headers.get('Origin')
-    if origin in allowed_origins:
-        response.headers.add('Access-Control-Allow-Origin', origin)
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization,Accept')
-        response.headers.add('Access-Control-Allow-Methods', 'GET,POST,OPTIONS')
-        response.headers.add('Access-Control-Allow-Credentials', 'true')
-        response.headers.add('Access-Control-Expose-Headers', 'Content-Type,Authorization')
-    return response
-
 # Add this test endpoint
 @app.route('/api/email/test', methods=['GET'])
 def test_email_config():
     try:
-        print("\n=== Testing Email Configuration ===")
-        print("SMTP Configuration:")
-        print(f"- Server: {SMTP_SERVER}")
-        print(f"- Port: {SMTP_PORT}")
-        print(f"- Username: {SMTP_USERNAME}")
-        print(f"- Password: {'*' * len(SMTP_PASSWORD) if SMTP_PASSWORD else 'Not Set'}")
-        
-        if not all([SMTP_SERVER, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD, SENDER_EMAIL]):
-            missing = []
-            if not SMTP_SERVER: missing.append('SMTP_SERVER')
-            if not SMTP_PORT: missing.append('SMTP_PORT')
-            if not SMTP_USERNAME: missing.append('SMTP_USERNAME')
-            if not SMTP_PASSWORD: missing.append('SMTP_PASSWORD')
-            if not SENDER_EMAIL: missing.append('SENDER_EMAIL')
+        if SMTP_MISSING:
             return jsonify({
                 'status': 'error',
-                'message': f'Missing configuration: {", ".join(missing)}'
+                'message': f'Missing configuration: {", ".join(SMTP_MISSING)}'
             }), 500
             
         return jsonify({
@@ -491,9 +987,18 @@ def test_email_config():
             }
         })
     except Exception as e:
-        print(f"Error testing email config: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Error testing email config")
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+@app.route('/healthz', methods=['GET'])
+@limiter.exempt
+def healthz():
+    """Liveness check for load balancers, including the backend circuit breaker state."""
+    return jsonify({'status': 'ok', 'backend_circuit': BACKEND_BREAKER.state})
+
+# WSGI servers look for `application` by default
+application = app
+
 if __name__ == '__main__':
-    app.run(port=GATEWAY_PORT, debug=True)
+    # The reloader and debugger are only for local development; production runs under gunicorn (see wsgi.py)
+    app.run(port=GATEWAY_PORT, debug=os.getenv('FLASK_ENV') == 'development')
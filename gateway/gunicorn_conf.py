@@ -0,0 +1,25 @@
+# Production entrypoint: gunicorn -c gateway/gunicorn_conf.py --chdir gateway wsgi:app
+# wsgi.py monkey-patches with gevent, so each worker overlaps many in-flight backend and SMTP calls
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('GATEWAY_PORT', 5001)}"
+worker_class = 'gevent'
+workers = int(os.getenv('GATEWAY_WORKERS', multiprocessing.cpu_count()))
+worker_connections = 1000
+timeout = 30
+keepalive = 65
+# Each worker builds its own backend/SMTP pools and background threads, so import the app after the fork
+preload_app = False
+# Time a worker gets on restart/shutdown to finish requests and drain queued confirmation emails
+graceful_timeout = 30
+# Refuse oversized request heads before the app sees them (bodies are capped by MAX_CONTENT_LENGTH)
+limit_request_line = 4094
+limit_request_fields = 50
+limit_request_field_size = 8190
+
+
+def worker_exit(server, worker):
+    """Send any confirmation emails still queued in this worker before it goes away."""
+    from app import EMAIL_POOL
+    EMAIL_POOL.shutdown(wait=True)
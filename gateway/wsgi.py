@@ -0,0 +1,6 @@
+# Production entrypoint: gunicorn -c gateway/gunicorn_conf.py --chdir gateway wsgi:app
+# Patch the standard library before Flask/requests are imported so backend and SMTP calls yield to other requests
+from gevent import monkey
+monkey.patch_all()
+
+from app import app
@@ -3,8 +3,7 @@ import json
 import os
 from dotenv import load_dotenv
 import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from email.message import EmailMessage
 
 # Load environment variables
 load_dotenv()
@@ -27,11 +26,11 @@ def test_smtp_directly():
     
     try:
         # Create test message
-        msg = MIMEMultipart()
+        msg = EmailMessage()
         msg['From'] = SENDER_EMAIL
         msg['To'] = SMTP_USERNAME  # Send to self
         msg['Subject'] = 'SMTP Test Email'
-        msg.attach(MIMEText('This is a test email to verify SMTP configuration.', 'plain'))
+        msg.set_content('This is a test email to verify SMTP configuration.')
         
         print("\nConnecting to SMTP server...")
         server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
@@ -69,16 +68,17 @@ def test_gateway_email():
     }
 
     print("\n=== Testing Gateway Email Endpoint ===")
-    print("1. Testing email configuration...")
-    config_response = requests.get('http://localhost:5001/api/email/test')
-    print("Configuration response:", config_response.json())
+    # One session so both calls share a keep-alive connection to the gateway
+    with requests.Session() as session:
+        print("1. Testing email configuration...")
+        config_response = session.get('http://localhost:5001/api/email/test')
+        print("Configuration response:", config_response.json())
 
-    print("\n2. Testing email sending...")
-    email_response = requests.post(
-        'http://localhost:5001/api/email/send',
-        json=test_data,
-        headers={'Content-Type': 'application/json'}
-    )
+        print("\n2. Testing email sending...")
+        email_response = session.post(
+            'http://localhost:5001/api/email/send',
+            json=test_data
+        )
 
     print("Status Code:", email_response.status_code)
     print("Response:", email_response.text)